@@ -1,69 +1,50 @@
+import importlib
 import os
-import subprocess
-
-def activate_virtualenv():
-    venv_path = os.path.join('venv', 'bin', 'activate')
-    return venv_path
-
-def run_script(script_path):
+import sys
+import traceback
+
+# Reports run inside this interpreter, so imports, database pools and snapshots loaded by one
+# report are reused by the next one chosen in the same session.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+# Menu choice -> (label, entry point module, function).
+REPORTS = {
+    '1': ("Run CAS Mapping", 'cas_mapping.main', 'run_all_scripts'),
+    '2': ("Run Assessment Properties Tracker", 'assessment_properties_tracker.main', 'run_script'),
+    '3': ("Run Assessment Tracker", 'assessment_tracker.main', 'run_script'),
+    '4': ("Run Endpoint Report", 'endpoint_report.main', 'run_script'),
+    '5': ("Run H Statement Report", 'h_statement_report.main', 'main'),
+    '6': ("Run Ingredient Intelligence Report", 'ingredient_intelligence_report.main', 'run_all_scripts'),
+    '7': ("Run Small Tasks", 'small_tasks.main', 'main'),
+    '8': ("Run User Report", 'user_report.main', 'run_script'),
+    '9': ("Run Visualization", 'visualization.main', 'main'),
+    '10': ("Run List Checking", 'list_checking.main', 'main')
+}
+
+def run_report(module_name, function):
     try:
-        activate_script = activate_virtualenv()
-        command = f'source {activate_script} && python {script_path}'
-        subprocess.check_call(['/bin/zsh', '-c', command])
-    except subprocess.CalledProcessError as e:
+        getattr(importlib.import_module(module_name), function)()
+    except Exception as e:
+        traceback.print_exc()
         print(f"An error occurred while running the script: {e}")
 
 def main():
     print("Welcome to cfkit! Please select a report to run:")
 
-    options = {
-        'cas_mapping': 'src/cas_mapping/main.py',
-        'assessment_properties_tracker': 'src/assessment_properties_tracker/main.py',
-        'assessment_tracker': 'src/assessment_tracker/main.py',
-        'endpoint_report': 'src/endpoint_report/main.py',
-        'h_statement_report': 'src/h_statement_report/main.py',
-        'ingredient_intelligence_report': 'src/ingredient_intelligence_report/main.py',
-        'small_tasks': 'src/small_tasks/main.py',
-        'user_report': 'src/user_report/main.py',
-        'visualization': 'src/visualization/main.py',
-        'list_checking': 'src/list_checking/main.py'
-    }
-
-    print("1. Run CAS Mapping")
-    print("2. Run Assessment Properties Tracker")
-    print("3. Run Assessment Tracker")
-    print("4. Run Endpoint Report")
-    print("5. Run H Statement Report")
-    print("6. Run Ingredient Intelligence Report")
-    print("7. Run Small Tasks")
-    print("8. Run User Report")
-    print("9. Run Visualization")
-    print("10. Run List Checking")
+    while True:
+        for number, (label, _, _) in REPORTS.items():
+            print(f"{number}. {label}")
 
-    choice = input("Enter the number of the report to run: ")
+        choice = input("Enter the number of the report to run (or press Enter to exit): ").strip()
+        if not choice:
+            break
+        if choice not in REPORTS:
+            print("Invalid choice. Please try again.")
+            continue
 
-    if choice == '1':
-        run_script(options['cas_mapping'])
-    elif choice == '2':
-        run_script(options['assessment_properties_tracker'])
-    elif choice == '3':
-        run_script(options['assessment_tracker'])
-    elif choice == '4':
-        run_script(options['endpoint_report'])
-    elif choice == '5':
-        run_script(options['h_statement_report'])
-    elif choice == '6':
-        run_script(options['ingredient_intelligence_report'])
-    elif choice == '7':
-        run_script(options['small_tasks'])
-    elif choice == '8':
-        run_script(options['user_report'])
-    elif choice == '9':
-        run_script(options['visualization'])
-    elif choice == '10':
-        run_script(options['list_checking'])
-    else:
-        print("Invalid choice. Please try again.")
+        _, module_name, function = REPORTS[choice]
+        run_report(module_name, function)
+        print("\nSelect another report to run, or press Enter to exit:")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -28,6 +28,7 @@ setup(
         'pandas==2.2.2',
         'plotly==5.23.0',
         'psycopg2-binary==2.9.9',
+        'pyarrow==17.0.0',
         'pyasn1==0.6.0',
         'pyasn1_modules==0.4.0',
         'pyparsing==3.1.2',
@@ -2,11 +2,10 @@ import re
 import os
 import pandas as pd
 import gspread
-from gspread_dataframe import set_with_dataframe
 from oauth2client.service_account import ServiceAccountCredentials
 import shutil
 from datetime import datetime
-from utilities import cas_handling, connections, data_manipulation
+from utilities import cas_handling, connections, data_manipulation, sheets
 import json
 import numpy as np
 
@@ -137,7 +136,9 @@ spreadsheet = client.open(spreadsheet_name)
 
 current_date = datetime.now().strftime('%Y-%m-%d')
 dynamic_name = f"({current_date}) CHA Properties"
-worksheet = spreadsheet.add_worksheet(title=dynamic_name, rows="100", cols="20")
+# Sized for the full frame up front; fails before creating the worksheet if the spreadsheet lacks room.
+writer = sheets.SheetWriter.add_worksheet(spreadsheet, dynamic_name, rows=len(df) + 1, cols=len(df.columns), index=0)
+worksheet = writer.worksheet
 
 if 'cas_rn' in df.columns:
     cas_column_index = df.columns.get_loc('cas_rn')
@@ -164,8 +165,7 @@ format_request = {
     }
 }
 
-spreadsheet.batch_update({"requests": [format_request]})
-set_with_dataframe(worksheet, df)
+writer.request(format_request)
 
 requests = [
     {
@@ -239,12 +239,16 @@ requests = [
         }
     },
     {
-        'updateSheetProperties': {
-            'properties': {
-                'sheetId': worksheet.id,
-                'index': 0
+        "repeatCell": {
+            "range": {
+                "sheetId": worksheet.id
+            },
+            "cell": {
+                "userEnteredFormat": {
+                    "wrapStrategy": "CLIP"
+                }
             },
-            'fields': 'index'
+            "fields": "userEnteredFormat.wrapStrategy"
         }
     }
 ]
@@ -266,8 +270,9 @@ if 'name' in df.columns:
         }
     })
 
-spreadsheet.batch_update({"requests": requests})
-worksheet.format("A1:ZZ1000", {"wrapStrategy": "CLIP"})
+writer.request(*requests)
+# Formatting goes out in one batchUpdate, then the data as row/column blocks in parallel.
+writer.upload_dataframe(df)
 
 current_date = datetime.now().strftime('%Y_%m_%d')
 output_directory = os.path.join(os.path.dirname(__file__), f'../../../data/assessment_properties_tracker/{current_date}_output')
@@ -1,11 +1,10 @@
 import os
-import subprocess
+
+from utilities import dispatch
 
 def run_script():
     script_path = os.path.join(os.path.dirname(__file__), "scripts", "assessment_tracker.py")
-    print(f"Running assessment_tracker.py...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed assessment_tracker.py.")
+    dispatch.run_script(script_path)
 
 if __name__ == "__main__":
     run_script()
@@ -4,18 +4,17 @@ import os
 import gspread
 import numpy as np
 import pandas as pd
-from gspread_dataframe import set_with_dataframe
 from oauth2client.service_account import ServiceAccountCredentials
 import shutil
 
-from utilities import connections, constants, cas_handling, data_manipulation
+from utilities import connections, constants, cas_handling, data_manipulation, sheets
 
 sql_file_path = os.path.join(os.path.dirname(__file__), '../../../assets/assessment_tracker/assessment_tracker.sql')
 with open(sql_file_path, 'r') as file:
     tracker_assessment_query = file.read()
-engine = connections.get_db_engine('prod')  # Replace 'prod' with 'stg' if needed
-
-df = connections.run_query(engine, tracker_assessment_query)
+# Reruns within the cache TTL reuse the last result; set CFKIT_QUERY_CACHE_BYPASS=1 (or pass
+# refresh=True) to publish from a fresh query.
+df = connections.run_cached_query('prod', tracker_assessment_query)  # Replace 'prod' with 'stg' if needed
 df = data_manipulation.datetime_delocal_date_only(df)
 
 custom_order = [
@@ -210,44 +209,38 @@ df.insert(df.columns.get_loc("Verification Length") + 1, 'Initial Draft Length',
           df['Submitted Date'] - df['Draft Date'])
 
 dynamic_name = f"({current_date}) CHAs"
-worksheet = spreadsheet.add_worksheet(title=dynamic_name, rows="100", cols="20")
+# One add_worksheet call (sized and positioned up front); all formatting, notes and values are
+# queued on the writer and sent in one batchUpdate plus one values.batchUpdate at the end.
+writer = sheets.SheetWriter.add_worksheet(spreadsheet, dynamic_name, rows=len(df) + 1, cols=len(df.columns), index=0)
+worksheet = writer.worksheet
 
-requests = [
-    {
-        'updateSheetProperties': {
-            'properties': {
-                'sheetId': worksheet.id,
-                'index': 0,
-            },
-            'fields': 'index',
-        }
-    }
-]
-spreadsheet.batch_update({'requests': requests})
+# Columns formatted as TEXT in the sheet; their values are also sent as text so they are not stored as numbers.
+text_columns = ['ChemFORWARD Link', 'CAS Number']
 
-format_request = {
-    "repeatCell": {
-        "range": {
-            "sheetId": worksheet.id,
-            "startRowIndex": 0,
-            "endRowIndex": len(df),
-            "startColumnIndex": 6,  # Column G
-            "endColumnIndex": 8  # Column I
-        },
-        "cell": {
-            "userEnteredFormat": {
-                "numberFormat": {
-                    "type": "TEXT"
+for column in text_columns:
+    col_index = df.columns.get_loc(column)
+    format_request = {
+        "repeatCell": {
+            "range": {
+                "sheetId": worksheet.id,
+                "startRowIndex": 0,
+                "endRowIndex": len(df),
+                "startColumnIndex": col_index,
+                "endColumnIndex": col_index + 1
+            },
+            "cell": {
+                "userEnteredFormat": {
+                    "numberFormat": {
+                        "type": "TEXT"
+                    }
                 }
-            }
-        },
-        "fields": "userEnteredFormat.numberFormat"
+            },
+            "fields": "userEnteredFormat.numberFormat"
+        }
     }
-}
+    writer.request(format_request)
 
-spreadsheet.batch_update({"requests": [format_request]})
-
-set_with_dataframe(worksheet, df)
+writer.set_dataframe(df, text_columns=text_columns)
 
 folder_name = 'assessment_tracker'
 
@@ -261,7 +254,7 @@ df.to_excel(excel_output_file, index=False)
 
 shutil.copy(sql_file_path, os.path.join(output_directory, f'{current_date_folder}_{folder_name}_query.sql'))
 
-print(f"Data has been saved to Google Sheets and also exported to Excel at {excel_output_file}")
+print(f"Data has been exported to Excel at {excel_output_file}")
 
 requests = [
     {
@@ -595,7 +588,7 @@ requests.append({
 })
 
 
-spreadsheet.batch_update({"requests": requests})
+writer.request(*requests)
 
 hover_tips = {
     'CF ID': "Chemical ID within the App",
@@ -641,5 +634,7 @@ hover_tips = {
 
 for col_name, tip in hover_tips.items():
     if col_name in df.columns:
-        cell = gspread.utils.rowcol_to_a1(1, df.columns.get_loc(col_name) + 1)
-        worksheet.update_note(cell, tip)
\ No newline at end of file
+        writer.set_note(1, df.columns.get_loc(col_name) + 1, tip)
+
+writer.flush()
+print(f"Worksheet '{dynamic_name}' uploaded to Google Sheets.")
@@ -1,16 +1,8 @@
-import os
-import subprocess
-
-def run_script(script):
-    script_path = os.path.join(os.path.dirname(__file__), "scripts", script)
-    print(f"Running {script}...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed {script}.")
+from utilities import dispatch
 
 def run_all_scripts():
-    scripts = [ "cas_mapping.py"]
-    for script in scripts:
-        run_script(script)
+    # Imported rather than run as a file: the matching worker processes look its functions up by module name.
+    dispatch.run_entry_point('cas_mapping.scripts.cas_mapping')
 
 if __name__ == "__main__":
     run_all_scripts()
@@ -1,12 +1,16 @@
+import numpy as np
 import pandas as pd
-from Levenshtein import distance as levenshtein_distance
+from rapidfuzz.distance import Levenshtein
+from rapidfuzz.process import cdist
 from tqdm import tqdm
 import os
 import shutil
 import re
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from utilities import connections
+from utilities import cas_handling, data_manipulation, decision_store, match_cache, snapshots, string_index
 
 def get_column_name(df, title, message):
     print(f"{title}: {message}")
@@ -17,25 +21,68 @@ def get_column_name(df, title, message):
         print(f"Error: Column '{column_name}' not found or no column name provided. Exiting.")
         exit()
 
+# Phrases removed from raw ingredient lists before lowercasing (case-sensitive), in priority order.
+PHRASES_TO_REMOVE = [
+    "peut contenir", "fair trade ingredient", "parfum/fragrance",
+    "(parfum)fragrance", "fragrance (parfum)", "(parfum) fragrance",
+    "certified organic ingredient", "certified organic ingredients",
+    "certified organicingredients", "natural ingredients",
+    "may vary in color and consistency", "usda", "love & pride.",
+    "love & pride"
+]
+PHRASES_PATTERN = re.compile('|'.join(re.escape(phrase) for phrase in PHRASES_TO_REMOVE))
+
+# Dtype of the normalized ingredient tokens and of the match table index they are joined on.
+INGREDIENT_DTYPE = 'string[pyarrow]'
+
 def clean_ingredients(ingredients):
     ingredients = str(ingredients)
     ingredients = ingredients.encode("utf-8", "ignore").decode("utf-8", "ignore")
     ingredients = ingredients.replace('*', '').replace(':', '').replace('±', '')
-    phrases_to_remove = [
-        "peut contenir", "fair trade ingredient", "parfum/fragrance",
-        "(parfum)fragrance", "fragrance (parfum)", "(parfum) fragrance",
-        "certified organic ingredient", "certified organic ingredients",
-        "certified organicingredients", "natural ingredients",
-        "may vary in color and consistency", "usda", "love & pride.", 
-        "love & pride", "()"
-    ]
-    for phrase in phrases_to_remove:
-        ingredients = ingredients.replace(phrase, '')
+    ingredients = PHRASES_PATTERN.sub('', ingredients).replace('()', '')
     ingredients = ingredients.lower()
     ingredients = re.sub(r'[^a-zA-Z0-9\s(),-]', '', ingredients)
     ingredients = ingredients.strip()
     return ingredients
 
+def normalize_ingredients(raw):
+    """
+    Vectorized clean_ingredients over a Series of raw ingredient lists.
+    Each distinct raw string is normalized once; the result is aligned with raw.
+    """
+    codes, uniques = pd.factorize(raw.astype(str))
+    cleaned = (pd.Series(uniques, dtype=object)
+               .str.encode("utf-8", "ignore").str.decode("utf-8", "ignore")
+               .str.replace(r'[*:±]', '', regex=True)
+               .str.replace(PHRASES_PATTERN, '', regex=True)
+               .str.replace('()', '', regex=False)
+               .str.lower()
+               .str.replace(r'[^a-zA-Z0-9\s(),-]', '', regex=True)
+               .str.strip())
+    return pd.Series(cleaned.to_numpy()[codes], index=raw.index, dtype=object)
+
+def explode_ingredients(df, ingredients_column, output_column='ingredients_lower'):
+    """
+    One row per ingredient token: the normalized ingredient list of each row is split on
+    commas and the row repeated once per token, in order (as df.explode would).
+    Normalization and splitting run once per distinct raw string; tokens are Arrow-backed strings.
+    """
+    codes, uniques = pd.factorize(df[ingredients_column].astype(str))
+    tokens = normalize_ingredients(pd.Series(uniques, dtype=object)).str.split(r',\s+')
+
+    counts = tokens.str.len().to_numpy()
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    token_values = np.array([token for row in tokens for token in row], dtype=object)
+
+    lengths = counts[codes]
+    rows = np.repeat(np.arange(len(df)), lengths)
+    row_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = np.repeat(offsets[codes], lengths) + np.arange(lengths.sum()) - row_starts
+
+    exploded = df.iloc[rows].copy()
+    exploded[output_column] = pd.array(token_values[positions], dtype=INGREDIENT_DTYPE)
+    return exploded
+
 def extract_additional_casrns(json_str):
     try:
         if isinstance(json_str, bytes):
@@ -47,13 +94,31 @@ def extract_additional_casrns(json_str):
     except:
         return []
 
-def find_best_match(value, profiles_db, cas_mapping):
-    """
-    Find the best match for an ingredient across all sources.
-    Returns a dictionary with the match information.
-    """
-    value_str = str(value) if value is not None else ""
-    best_match = {
+MATCH_SOURCES = [
+    ("profiles_name", "name_lower", "profiles", "name"),
+    ("profiles_inci", "inci_lower", "profiles", "inci"),
+    ("cas_mapping", "name_lower", "mapping", "name")
+]
+
+# Upper bound on the number of cells in one distance matrix chunk (int32, ~80 MB).
+MATCH_CHUNK_CELLS = 20_000_000
+
+# Edit distance answered by the q-gram indexes; anything further falls back to a full scan.
+INDEX_MAX_DISTANCE = 2
+
+# A query with candidates for more than this fraction of a source is left to the full scan.
+INDEX_MAX_CANDIDATES_FRACTION = 0.02
+
+# Unique ingredients matched between writes to the persistent match cache.
+MATCH_BATCH_SIZE = 500
+
+# Below this many ingredients to match, a process pool costs more than it saves.
+PARALLEL_MIN_INGREDIENTS = 2000
+
+REVIEW_DIR = os.path.join(os.path.dirname(__file__), '../../../data/cas_mapping/review')
+
+def empty_match():
+    return {
         'distance_lev': float('inf'),
         'priority_score': -1,
         'map_source': None,
@@ -71,70 +136,264 @@ def find_best_match(value, profiles_db, cas_mapping):
         'map_list_hazard': None,
         'map_list_c2c': None
     }
-    
-    sources = [
-        ("profiles_name", profiles_db["name_lower"], profiles_db, "profiles", "name"),
-        ("profiles_inci", profiles_db["inci_lower"], profiles_db, "profiles", "inci"),
-        ("cas_mapping", cas_mapping["name_lower"], cas_mapping, "mapping", "name")
-    ]
-    
-    for source_name, source_col, source_df, map_source, map_type in sources:
-        distances = source_col.apply(lambda x: levenshtein_distance(value_str, str(x) if x is not None else ""))
-        min_index = distances.argmin()
-        min_distance = distances[min_index]
-        
-        priority_score = 0
-        if source_df is profiles_db:
-            matched_row = source_df.iloc[min_index]
-            if matched_row['status'] != 'screening_only':
-                priority_score += 10
-            if pd.notna(matched_row['cas_rn']):
-                priority_score += 5
-        
-        if (min_distance < best_match['distance_lev'] or 
-            (min_distance == best_match['distance_lev'] and priority_score > best_match['priority_score'])):
-            
-            best_match['distance_lev'] = min_distance
-            best_match['priority_score'] = priority_score
-            best_match['map_source'] = map_source
-            best_match['map_type'] = map_type
-            best_match['matched_on'] = source_col.iloc[min_index]
-            
-            matched_row = source_df.iloc[min_index]
-            if source_df is profiles_db:
-                best_match['map_casrn'] = str(matched_row['cas_rn'])
-                best_match['map_name'] = str(matched_row['name'])
-                best_match['map_inci'] = str(matched_row['inci'])
-                best_match['map_status'] = str(matched_row['status'])
-                best_match['map_hazard'] = str(matched_row['manual_hazard_band_score'])
-                best_match['map_c2c'] = str(matched_row['manual_rollup_score'])
-                best_match['map_scil'] = str(matched_row['scil_status'])
-                best_match['map_tco'] = str(matched_row['tco_status'])
-                best_match['map_additional_casrn'] = ','.join(matched_row['additional_casrns_list'])
-                best_match['map_list_hazard'] = str(matched_row['list_based_hazard_score'])
-                best_match['map_list_c2c'] = str(matched_row['list_based_c2c_score'])
+
+def profile_match_fields(matched_row):
+    """Match fields taken from a row of the profiles table."""
+    return {
+        'map_casrn': str(matched_row['cas_rn']),
+        'map_name': str(matched_row['name']),
+        'map_inci': str(matched_row['inci']),
+        'map_status': str(matched_row['status']),
+        'map_hazard': str(matched_row['manual_hazard_band_score']),
+        'map_c2c': str(matched_row['manual_rollup_score']),
+        'map_scil': str(matched_row['scil_status']),
+        'map_tco': str(matched_row['tco_status']),
+        'map_additional_casrn': ','.join(matched_row['additional_casrns_list']),
+        'map_list_hazard': str(matched_row['list_based_hazard_score']),
+        'map_list_c2c': str(matched_row['list_based_c2c_score'])
+    }
+
+def mapping_match_fields(matched_row):
+    """Match fields taken from a row of the cas_maps.xlsx mappings sheet."""
+    return {
+        'map_casrn': str(matched_row['casrn']),
+        'map_name': str(matched_row['name']),
+        'map_type': str(matched_row['type']),
+        'map_inci': None,
+        'map_status': None,
+        'map_hazard': None,
+        'map_c2c': None,
+        'map_scil': None,
+        'map_tco': None,
+        'map_additional_casrn': None,
+        'map_list_hazard': None,
+        'map_list_c2c': None
+    }
+
+def profile_priority_scores(profiles_db):
+    """Tie-breaking priority per profile: +10 when not screening only, +5 when it has a CAS."""
+    return ((profiles_db['status'] != 'screening_only').astype(int) * 10
+            + profiles_db['cas_rn'].notna().astype(int) * 5).to_numpy()
+
+def nearest_choices(queries, choices, workers=-1):
+    """
+    Levenshtein distance from every query to its nearest choice.
+    Returns (index, distance) arrays; ties resolve to the first choice, like Series.argmin.
+    """
+    choices = [str(x) if x is not None else "" for x in choices]
+    indices = np.empty(len(queries), dtype=np.int64)
+    distances = np.empty(len(queries), dtype=np.int64)
+    chunk_size = max(1, MATCH_CHUNK_CELLS // max(len(choices), 1))
+
+    for start in range(0, len(queries), chunk_size):
+        matrix = cdist(queries[start:start + chunk_size], choices,
+                       scorer=Levenshtein.distance, dtype=np.int32, workers=workers)
+        chunk_indices = matrix.argmin(axis=1)
+        indices[start:start + chunk_size] = chunk_indices
+        distances[start:start + chunk_size] = matrix[np.arange(len(chunk_indices)), chunk_indices]
+
+    return indices, distances
+
+def load_reference_indexes(profiles_db, cas_mapping):
+    """
+    Load the on-disk q-gram indexes over each match source, rebuilding any whose reference data changed.
+    """
+    source_frames = {"profiles": profiles_db, "mapping": cas_mapping}
+    return {
+        source_name: string_index.load_or_build_index(source_name, source_frames[map_source][column])
+        for source_name, column, map_source, _ in MATCH_SOURCES
+    }
+
+def nearest_with_index(queries, choices, index, max_distance=INDEX_MAX_DISTANCE, workers=-1):
+    """
+    Same result as nearest_choices, but answers exact matches and queries within max_distance
+    from the index. Queries the index cannot answer cheaply (nothing that close, or too many
+    candidates to verify) are scanned together in one batched distance matrix.
+    """
+    indices = np.empty(len(queries), dtype=np.int64)
+    distances = np.empty(len(queries), dtype=np.int64)
+    max_candidates = max(int(len(index.strings) * INDEX_MAX_CANDIDATES_FRACTION), 1)
+    misses = []
+
+    for position, query in enumerate(queries):
+        exact = index.exact(query)
+        if exact is not None:
+            indices[position], distances[position] = exact, 0
+            continue
+        hit = index.nearest(query, max_distance, max_candidates=max_candidates)
+        if hit is None:
+            misses.append(position)
+        else:
+            indices[position], distances[position] = hit
+
+    if misses:
+        miss_indices, miss_distances = nearest_choices([queries[p] for p in misses], choices, workers=workers)
+        indices[misses] = miss_indices
+        distances[misses] = miss_distances
+
+    return indices, distances
+
+def find_best_matches(values, profiles_db, cas_mapping, indexes=None, workers=-1):
+    """
+    Find the best match for many ingredients across all sources in one pass.
+    Each source is scored with a single distance matrix (or its q-gram index when given);
+    the per-ingredient selection and tie-breaking are the same as find_best_match.
+    Returns a dictionary of ingredient -> match information.
+    """
+    values = list(values)
+    queries = [str(value) if value is not None else "" for value in values]
+    source_frames = {"profiles": profiles_db, "mapping": cas_mapping}
+    profile_priorities = profile_priority_scores(profiles_db)
+
+    nearest = {}
+    for source_name, column, map_source, _ in MATCH_SOURCES:
+        choices = source_frames[map_source][column]
+        if indexes is not None:
+            nearest[source_name] = nearest_with_index(queries, choices, indexes[source_name], workers=workers)
+        else:
+            nearest[source_name] = nearest_choices(queries, choices, workers=workers)
+
+    matches = {}
+    for position, value in enumerate(values):
+        best_match = empty_match()
+
+        for source_name, column, map_source, map_type in MATCH_SOURCES:
+            source_df = source_frames[map_source]
+            min_index = nearest[source_name][0][position]
+            min_distance = int(nearest[source_name][1][position])
+            priority_score = int(profile_priorities[min_index]) if map_source == "profiles" else 0
+
+            if (min_distance < best_match['distance_lev'] or
+                (min_distance == best_match['distance_lev'] and priority_score > best_match['priority_score'])):
+
+                best_match['distance_lev'] = min_distance
+                best_match['priority_score'] = priority_score
+                best_match['map_source'] = map_source
+                best_match['map_type'] = map_type
+                best_match['matched_on'] = source_df[column].iloc[min_index]
+
+                matched_row = source_df.iloc[min_index]
+                if map_source == "profiles":
+                    best_match.update(profile_match_fields(matched_row))
+                else:
+                    best_match.update(mapping_match_fields(matched_row))
+
+                if min_distance == 0:
+                    break
+
+        matches[value] = best_match
+
+    return matches
+
+def find_best_match(value, profiles_db, cas_mapping):
+    """
+    Find the best match for an ingredient across all sources.
+    Returns a dictionary with the match information.
+    """
+    return find_best_matches([value], profiles_db, cas_mapping)[value]
+
+# Reference data used by the process pool workers. With the fork start method it is set in the parent
+# before the pool starts and shared copy-on-write; otherwise each worker loads it in its initializer.
+_worker_references = {}
+
+def _init_match_worker(profiles_db, cas_mapping, indexes):
+    _worker_references.update(profiles_db=profiles_db, cas_mapping=cas_mapping, indexes=indexes)
+
+def _match_batch(ingredients):
+    return find_best_matches(ingredients, _worker_references['profiles_db'], _worker_references['cas_mapping'],
+                             indexes=_worker_references['indexes'], workers=1)
+
+def _match_pool(workers, profiles_db, cas_mapping, indexes):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _init_match_worker(profiles_db, cas_mapping, indexes)
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker,
+                               initargs=(profiles_db, cas_mapping, indexes))
+
+def match_with_cache(ingredients, profiles_db, cas_mapping, indexes, reference_version, workers=None):
+    """
+    Best matches for the ingredients, fuzzy-matching only those not already in the persistent
+    match cache for this reference-data version. New matches are cached batch by batch.
+
+    With more than PARALLEL_MIN_INGREDIENTS to match, batches of the missing ingredients are matched
+    on a process pool (workers processes, default all cores). Results do not depend on the number of workers.
+    """
+    cache = match_cache.MatchCache(reference_version)
+    try:
+        matches = cache.get_many(ingredients)
+        missing = [ingredient for ingredient in ingredients if ingredient not in matches]
+        print(f"{len(matches)} ingredients found in match cache, {len(missing)} to match.")
+        batches = [missing[start:start + MATCH_BATCH_SIZE] for start in range(0, len(missing), MATCH_BATCH_SIZE)]
+
+        workers = workers or os.cpu_count() or 1
+        parallel = workers > 1 and len(missing) >= PARALLEL_MIN_INGREDIENTS
+        if parallel:
+            print(f"Matching on {workers} processes...")
+        with tqdm(total=len(missing), desc="Matching unique ingredients") as progress:
+            if parallel:
+                try:
+                    with _match_pool(workers, profiles_db, cas_mapping, indexes) as executor:
+                        futures = [executor.submit(_match_batch, batch) for batch in batches]
+                        for future in as_completed(futures):
+                            batch = future.result()
+                            cache.put_many(batch)
+                            matches.update(batch)
+                            progress.update(len(batch))
+                finally:
+                    _worker_references.clear()
             else:
-                best_match['map_casrn'] = str(matched_row['casrn'])
-                best_match['map_name'] = str(matched_row['name'])
-                best_match['map_type'] = str(matched_row['type'])
-                best_match['map_inci'] = None
-                best_match['map_status'] = None
-                best_match['map_hazard'] = None
-                best_match['map_c2c'] = None
-                best_match['map_scil'] = None
-                best_match['map_tco'] = None
-                best_match['map_additional_casrn'] = None
-                best_match['map_list_hazard'] = None
-                best_match['map_list_c2c'] = None
-            
-            if min_distance == 0:
-                break
-    
-    return best_match
+                for batch in batches:
+                    batch = find_best_matches(batch, profiles_db, cas_mapping, indexes=indexes)
+                    cache.put_many(batch)
+                    matches.update(batch)
+                    progress.update(len(batch))
+    finally:
+        cache.close()
+
+    return matches
+
+def apply_decision(best_match, decision, profiles_db, cas_number=None):
+    """
+    Mark a match as accepted ('y'), rejected ('n') or replaced by the profile with cas_number ('r').
+    Returns False, leaving the match untouched, when the replacement CAS is not in the profiles table.
+    """
+    if decision == 'y':
+        best_match['distance_lev'] = '0-UY'
+    elif decision == 'n':
+        best_match['distance_lev'] = f"{best_match['distance_lev']}-UN"
+    elif decision == 'r':
+        key = cas_handling.cas_key(cas_number)
+        if key is None:
+            cas_match = profiles_db[profiles_db['cas_rn'] == cas_number]
+        else:
+            cas_match = profiles_db[profiles_db['cas_key'] == key]
+        if cas_match.empty:
+            return False
+        best_match['distance_lev'] = '0-UR'
+        best_match.update(profile_match_fields(cas_match.iloc[0]))
+    return True
 
-def prompt_for_user_decision(ingredient, best_match, profiles_db, cas_mapping):
+def suggest_replacement_cas(cas_number, profiles_db, known_cas):
+    """
+    Profiles whose CAS number the analyst probably meant: the corrected form of cas_number and
+    the profile CAS numbers one typo away from it. Returns a list of profile rows.
+    """
+    candidates = [cas_handling.correct_cas(cas_number)] + cas_handling.resolve_cas_typo(cas_number, known_cas)
+    suggestions = []
+    for candidate in dict.fromkeys(candidates):
+        key = cas_handling.cas_key(candidate)
+        if candidate not in known_cas or key is None:
+            continue
+        matches = profiles_db[profiles_db['cas_key'] == key]
+        if not matches.empty:
+            suggestions.append(matches.iloc[0])
+    return suggestions
+
+def prompt_for_user_decision(ingredient, best_match, profiles_db, cas_mapping, known_cas=None):
     """
     Prompt user for decision when no exact match is found.
+    When the set of profile CAS numbers is given, a replacement CAS that is not found is checked
+    for formatting errors and single typos so the intended profile can be suggested.
     Returns updated match dictionary.
     """
     print(f"\nIngredient: '{ingredient}'")
@@ -145,40 +404,117 @@ def prompt_for_user_decision(ingredient, best_match, profiles_db, cas_mapping):
     while True:
         decision = input("Enter 'y' to accept, 'n' to reject, or 'r' to replace with correct CAS: ").lower()
         
-        if decision == 'y':
-            best_match['distance_lev'] = '0-UY'
-            break
-        elif decision == 'n':
-            best_match['distance_lev'] = f"{best_match['distance_lev']}-UN"
+        if decision in ['y', 'n']:
+            apply_decision(best_match, decision, profiles_db)
             break
         elif decision == 'r':
             cas_number = input("Enter the correct CAS number: ").strip()
             
-            cas_match = profiles_db[profiles_db['cas_rn'] == cas_number]
-            
-            if not cas_match.empty:
-                matched_row = cas_match.iloc[0]
-                best_match['distance_lev'] = '0-UR'
-                best_match['map_casrn'] = str(matched_row['cas_rn'])
-                best_match['map_name'] = str(matched_row['name'])
-                best_match['map_inci'] = str(matched_row['inci'])
-                best_match['map_status'] = str(matched_row['status'])
-                best_match['map_hazard'] = str(matched_row['manual_hazard_band_score'])
-                best_match['map_c2c'] = str(matched_row['manual_rollup_score'])
-                best_match['map_scil'] = str(matched_row['scil_status'])
-                best_match['map_tco'] = str(matched_row['tco_status'])
-                best_match['map_additional_casrn'] = ','.join(matched_row['additional_casrns_list'])
-                best_match['map_list_hazard'] = str(matched_row['list_based_hazard_score'])
-                best_match['map_list_c2c'] = str(matched_row['list_based_c2c_score'])
+            if apply_decision(best_match, decision, profiles_db, cas_number):
                 print(f"Replaced with CAS {cas_number}")
                 break
             else:
                 print(f"CAS number {cas_number} not found in database. Please try again.")
+                if known_cas is not None:
+                    for suggestion in suggest_replacement_cas(cas_number, profiles_db, known_cas)[:5]:
+                        print(f"  Did you mean CAS {suggestion['cas_rn']} ('{suggestion['name']}')?")
         else:
             print("Invalid input. Please enter 'y', 'n', or 'r'.")
     
     return best_match
 
+def apply_saved_decisions(saved_decisions, profiles_db):
+    """
+    Match records for ingredients with a stored accept ('y') or replace ('r') decision. Accepted
+    profile matches and replacements are refreshed from the current profiles table so statuses and
+    scores stay current. Rejections ('n') are not applied here, see same_match_target.
+    """
+    saved_decisions = {ingredient: saved for ingredient, saved in saved_decisions.items() if saved[0] != 'n'}
+    first_profiles = profiles_db.dropna(subset=['cas_key']).drop_duplicates('cas_key')
+    profile_positions = dict(zip(first_profiles['cas_key'].astype(np.int64), first_profiles.index))
+    saved_keys = cas_handling.cas_key_series(
+        pd.Series([match.get('map_casrn') for _, match in saved_decisions.values()], dtype=object))
+
+    matches = {}
+    for (ingredient, (decision, match)), key in zip(saved_decisions.items(), saved_keys):
+        refresh = decision == 'r' or (decision == 'y' and match.get('map_source') == 'profiles')
+        if refresh and not pd.isna(key) and key in profile_positions:
+            match.update(profile_match_fields(profiles_db.loc[profile_positions[key]]))
+        matches[ingredient] = match
+    return matches
+
+def same_match_target(best_match, rejected_match):
+    """
+    True when a fresh best match points at the same reference entry as a saved rejection.
+    Rejected ingredients are matched again on every run: the rejection only holds (without asking
+    again) while the reference data still yields the same match.
+    """
+    return all(best_match.get(field) == rejected_match.get(field) for field in ['map_source', 'matched_on', 'map_casrn'])
+
+def export_review_workbook(pending_decisions, output_file):
+    """
+    Write the pending review queue to a workbook. Analysts fill in 'decision' (y, n or r) and,
+    for r, 'replacement_cas'; the workbook is imported on the next run from data/cas_mapping/review.
+    """
+    rows = []
+    for item in pending_decisions:
+        best_match = item['best_match']
+        rows.append({
+            'ingredient': item['ingredient'],
+            'matched_on': best_match['matched_on'],
+            'distance_lev': best_match['distance_lev'],
+            'map_source': best_match['map_source'],
+            'map_casrn': best_match['map_casrn'],
+            'map_name': best_match['map_name'],
+            'decision': '',
+            'replacement_cas': '',
+            'match_record': json.dumps(best_match, default=str)
+        })
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    pd.DataFrame(rows).to_excel(output_file, index=False)
+
+def import_review_workbooks(store, profiles_db, review_dir=REVIEW_DIR):
+    """
+    Record the decisions from completed review workbooks in the decision store and move each
+    workbook to review/imported. Rows left without a decision come back in a later review.
+    Returns the number of decisions imported.
+    """
+    if not os.path.isdir(review_dir):
+        return 0
+
+    imported = 0
+    for file_name in sorted(os.listdir(review_dir)):
+        file_path = os.path.join(review_dir, file_name)
+        if not file_name.endswith('.xlsx') or file_name.startswith('~$') or not os.path.isfile(file_path):
+            continue
+
+        review = pd.read_excel(file_path, dtype=str, keep_default_na=False)
+        for _, row in review.iterrows():
+            decision = row['decision'].strip().lower()
+            if decision not in ['y', 'n', 'r']:
+                continue
+            best_match = json.loads(row['match_record'])
+            if not apply_decision(best_match, decision, profiles_db, row['replacement_cas'].strip()):
+                print(f"{file_name}: CAS {row['replacement_cas']} for '{row['ingredient']}' not found in database. Skipped.")
+                continue
+            store.record(row['ingredient'], best_match, source=file_name)
+            imported += 1
+
+        os.makedirs(os.path.join(review_dir, 'imported'), exist_ok=True)
+        shutil.move(file_path, os.path.join(review_dir, 'imported', file_name))
+        print(f"Imported decisions from {file_name}.")
+
+    return imported
+
+def build_match_table(matches):
+    """
+    Columnar match table with one row per unique ingredient, indexed by ingredient,
+    ready to be joined onto the exploded ingredient rows.
+    """
+    index = pd.Index(list(matches.keys()), dtype=INGREDIENT_DTYPE, name='ingredients_lower')
+    return pd.DataFrame(list(matches.values()), index=index,
+                        columns=list(empty_match().keys()))
+
 def get_mapping_mode():
     """Get the mapping mode from user."""
     print("\nSelect mapping mode:")
@@ -192,52 +528,61 @@ def get_mapping_mode():
             return int(choice)
         print("Invalid choice. Please enter 1, 2, or 3.")
 
-def process_data(df_inci, ingredients_column, products_column, mapping_mode=3):
-    """Modified process_data function with mapping mode support."""
-    query = """
-    SELECT 
-        id,
-        name,
-        cas_rn,
-        inci,
-        status,
-        manual_rollup_score,
-        manual_hazard_band_score,
-        scil_status,
-        tco_status,
-        additional_casrns,
-        list_based_c2c_score,
-        list_based_hazard_score
-    FROM profiles
+def process_data(df_inci, ingredients_column, products_column, mapping_mode=3, workers=None):
     """
-    
-    engine = connections.get_db_engine('prod')
-    profiles_db = pd.read_sql(query, engine)
+    Modified process_data function with mapping mode support.
+    Large inputs are matched on a pool of workers processes (default: all cores).
+    """
+    profiles_db = snapshots.load_profiles('prod')
     
     cas_mapping_path = os.path.join(os.path.dirname(__file__), '../../../assets/cas_mapping/cas_maps.xlsx')
     cas_mapping = pd.read_excel(cas_mapping_path, sheet_name="mappings", engine='openpyxl', dtype=str)
     
+    reference_version = data_manipulation.dataframe_fingerprint(profiles_db) + data_manipulation.dataframe_fingerprint(cas_mapping)
+    
     profiles_db['additional_casrns_list'] = profiles_db['additional_casrns'].apply(extract_additional_casrns)
+    profiles_db['cas_key'] = cas_handling.cas_key_series(profiles_db['cas_rn'])
     profiles_db['name_lower'] = profiles_db['name'].str.lower()
     profiles_db['inci_lower'] = profiles_db['inci'].str.lower()
     cas_mapping['name_lower'] = cas_mapping['name'].str.lower()
+    profile_cas = set(profiles_db['cas_rn'].dropna().astype(str).str.strip())
     
     ingredient_match_cache = {}
     pending_decisions = []
     
     output_data = df_inci.copy()
     
-    unique_ingredients = df_inci['ingredients_lower'].unique()
+    unique_ingredients = [
+        ingredient for ingredient in df_inci['ingredients_lower'].unique()
+        if not (pd.isna(ingredient) or ingredient == '')
+    ]
+    
+    store = decision_store.DecisionStore()
+    imported = import_review_workbooks(store, profiles_db)
+    if imported:
+        print(f"Imported {imported} reviewed decisions.")
+    saved_decisions = store.latest(unique_ingredients)
+    saved_matches = apply_saved_decisions(saved_decisions, profiles_db)
+    rejected = {ingredient: match for ingredient, (decision, match) in saved_decisions.items() if decision == 'n'}
+    ingredient_match_cache.update(saved_matches)
+    print(f"{len(saved_matches)} ingredients resolved from saved analyst decisions, "
+          f"{len(rejected)} rejected matches to check again.")
+    
+    unique_ingredients = [ingredient for ingredient in unique_ingredients if ingredient not in saved_matches]
+    indexes = load_reference_indexes(profiles_db, cas_mapping)
+    matches = match_with_cache(unique_ingredients, profiles_db, cas_mapping, indexes, reference_version, workers=workers)
     
     for ingredient in tqdm(unique_ingredients, desc="Processing unique ingredients"):
-        if pd.isna(ingredient) or ingredient == '':
-            continue
-        
-        best_match = find_best_match(ingredient, profiles_db, cas_mapping)
+        best_match = matches[ingredient]
     
-        if mapping_mode in [1, 2] and best_match['distance_lev'] > 0:
+        if ingredient in rejected and same_match_target(best_match, rejected[ingredient]):
+            best_match = best_match.copy()
+            apply_decision(best_match, 'n', profiles_db)
+        elif mapping_mode in [1, 2] and best_match['distance_lev'] > 0:
             if mapping_mode == 1:
-                best_match = prompt_for_user_decision(ingredient, best_match, profiles_db, cas_mapping)
+                best_match = prompt_for_user_decision(ingredient, best_match, profiles_db, cas_mapping,
+                                                      known_cas=profile_cas)
+                store.record(ingredient, best_match)
             else:
                 pending_decisions.append({
                     'ingredient': ingredient,
@@ -248,25 +593,28 @@ def process_data(df_inci, ingredients_column, products_column, mapping_mode=3):
     
     if mapping_mode == 2 and pending_decisions:
         print(f"\n{len(pending_decisions)} ingredients need review:")
-        for item in pending_decisions:
-            updated_match = prompt_for_user_decision(
-                item['ingredient'], 
-                item['best_match'], 
-                profiles_db, 
-                cas_mapping
-            )
-            ingredient_match_cache[item['ingredient']] = updated_match
+        review_choice = input("Enter 'e' to export a review workbook for later import, or anything else to review now: ").strip().lower()
+        if review_choice == 'e':
+            review_file = os.path.join(REVIEW_DIR, f"{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_review.xlsx")
+            export_review_workbook(pending_decisions, review_file)
+            print(f"Review workbook saved to {review_file}. Fill in 'decision' and it will be imported on the next run.")
+        else:
+            for item in pending_decisions:
+                updated_match = prompt_for_user_decision(
+                    item['ingredient'], 
+                    item['best_match'], 
+                    profiles_db, 
+                    cas_mapping,
+                    known_cas=profile_cas
+                )
+                store.record(item['ingredient'], updated_match)
+                ingredient_match_cache[item['ingredient']] = updated_match
+    store.close()
     
-    for idx, row in tqdm(df_inci.iterrows(), total=len(df_inci), desc="Applying matches to all ingredients"):
-        ingredient = row['ingredients_lower']
-        
-        if pd.isna(ingredient) or ingredient == '' or ingredient not in ingredient_match_cache:
-            continue
-        
-        match = ingredient_match_cache[ingredient]
-        
-        for key, value in match.items():
-            output_data.loc[idx, key] = value
+    match_table = build_match_table(ingredient_match_cache)
+    # Inputs that already carry match columns (e.g. a previous output) get them replaced.
+    output_data = output_data.drop(columns=[col for col in match_table.columns if col in output_data.columns])
+    output_data = output_data.join(match_table, on='ingredients_lower')
     
     return output_data
 
@@ -292,10 +640,8 @@ def main():
     mapping_mode = get_mapping_mode()
     
     df['full_ingredients_list'] = df[ingredients_column]
-    df['ingredients_lower'] = df[ingredients_column].apply(clean_ingredients)
-    df['ingredients_lower'] = df['ingredients_lower'].str.split(r',\s+')
     
-    df_exploded = df.explode('ingredients_lower')
+    df_exploded = explode_ingredients(df, ingredients_column)
     df_exploded['product_index'] = df_exploded.groupby(products_column).ngroup() + 1
     df_exploded['ingredient_order'] = df_exploded.groupby(products_column).cumcount() + 1
     df_exploded = df_exploded.reset_index(drop=True)
@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+from utilities import cas_handling, snapshots
+
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../assets"))
 output_dir = os.path.join(base_dir, "cas_mapping")
 
@@ -24,7 +26,7 @@ profiles = profiles[["id",
                      "additional_casrns"
 ]]
 
-pharos = pd.read_excel(pharos_path)
+pharos = snapshots.load_pharos(pharos_path)
 pharos = pharos[["id", "casrn", "name", "scil_status", "tco_status", "hazard_band_score"]]
 
 profiles = profiles.rename(columns={
@@ -48,7 +50,7 @@ pharos = pharos.rename(columns={
 })
 
 profiles['hazard_band'] = profiles['hazard_band'].replace('z', '?')
-pharos = pharos[~pharos['casrn'].isin(profiles['casrn']) | pharos['casrn'].isna()]
+pharos = pharos[~cas_handling.cas_isin(pharos['casrn'], cas_handling.cas_key_set(profiles['casrn'])) | pharos['casrn'].isna()]
 combined = pd.concat([profiles, pharos], ignore_index=True)
 
 combined.loc[combined['status'].isna(), 'status'] = 'pharos_screening'
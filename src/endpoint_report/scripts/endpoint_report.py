@@ -6,6 +6,9 @@ from datetime import datetime
 from tqdm import tqdm
 from utilities import connections
 
+# Version documents fetched per chunk; each chunk is written out and reduced to its ratings before the next.
+VERSIONS_CHUNKSIZE = 500
+
 def save_df_to_csv(df, output_directory, base_filename):
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     filename = f"{base_filename}_{timestamp}.csv"
@@ -13,13 +16,14 @@ def save_df_to_csv(df, output_directory, base_filename):
     df.to_csv(filepath, index=False)
     print(f"Data saved to {filepath}")
 
-def fetch_latest_versions_verified():
+def fetch_latest_versions_verified_chunks(chunksize=VERSIONS_CHUNKSIZE):
     with open(os.path.join(os.path.dirname(__file__), '../../../assets/endpoint_report/fetch_latest_verions_verified.sql'), 'r') as file:
         query = file.read()
-    df = pd.read_sql(query, connections.get_db_engine('prod'))
-    return df
+    yield from connections.run_cached_query_stream('prod', query, chunksize=chunksize)
 
 def parse_json_in_column(df, column_name='document'):
+    if df.empty:
+        return df
     try:
         if isinstance(df[column_name].iloc[0], str):
             df[column_name] = df[column_name].apply(json.loads)
@@ -285,13 +289,26 @@ if __name__ == "__main__":
     os.makedirs(endpoints_dir, exist_ok=True)
     os.makedirs(endpoint_ratings_dir, exist_ok=True)
 
-    df = fetch_latest_versions_verified()
-    if not df.empty:
-        print("Saving latest versions verified...")
-        save_df_to_csv(df, latest_versions_dir, 'latest_versions_verified')
-        
-        print("Extracting GHS and MW data from documents...")
-        ghs_data, mw_data = extract_ratings_data(df)
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    latest_versions_file = os.path.join(latest_versions_dir, f"latest_versions_verified_{timestamp}.csv")
+    ghs_chunks, mw_chunks = [], []
+    row_count = 0
+
+    print("Fetching latest versions verified and extracting GHS and MW data from documents...")
+    for chunk in tqdm(fetch_latest_versions_verified_chunks(), desc="Version chunks"):
+        # An empty result arrives as one empty chunk; nothing is written for it.
+        if chunk.empty:
+            continue
+        chunk.to_csv(latest_versions_file, mode='a', header=row_count == 0, index=False)
+        row_count += len(chunk)
+        ghs_chunk, mw_chunk = extract_ratings_data(chunk)
+        ghs_chunks.append(ghs_chunk)
+        mw_chunks.append(mw_chunk)
+
+    if row_count:
+        print(f"Data saved to {latest_versions_file}")
+        ghs_data = pd.concat(ghs_chunks, ignore_index=True)
+        mw_data = pd.concat(mw_chunks, ignore_index=True)
         
         print("Saving GHS and MW endpoints...")
         save_df_to_csv(ghs_data, endpoints_dir, 'ghs_endpoints')
@@ -1,11 +1,9 @@
 import os
-import subprocess
+
+from utilities import dispatch
 
 def run_script(script):
-    script_path = os.path.join(os.path.dirname(__file__), "scripts", script)
-    print(f"Running {script}...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed {script}.")
+    dispatch.run_script(os.path.join(os.path.dirname(__file__), "scripts", script))
 
 def main():
     print("Please select which script to run:")
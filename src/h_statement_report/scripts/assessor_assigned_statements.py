@@ -11,7 +11,6 @@ with open(sql_file_path, 'r') as file:
     download_versions_query = file.read()
 
 connection = connections.get_db_engine('prod')
-results_df = pd.read_sql(download_versions_query, connection)
 
 current_date = datetime.now().strftime('%Y-%m-%d')
 base_output_directory = os.path.join(os.path.dirname(__file__), '../../../data/h_statement_reports/download_versions', current_date)
@@ -117,19 +116,20 @@ def process_and_compile_files(input_dir, output_dir):
     output_file_path = os.path.join(output_dir, 'compiled_data.xlsx')
     overall_df.to_excel(output_file_path, index=False)
 
-for index, row in results_df.iterrows():
-    profile_id = row['profile_id']
-    cas_rn = row['cas_rn']
-    document = row['document']
-    date_str = row['inserted_at'].strftime('%Y-%m-%d')
-    filename = f"({profile_id}_{cas_rn})_{date_str}_versions.txt"
-    filepath = os.path.join(base_output_directory, filename)
+for results_df in connections.run_query_stream(connection, download_versions_query, chunksize=500):
+    for index, row in results_df.iterrows():
+        profile_id = row['profile_id']
+        cas_rn = row['cas_rn']
+        document = row['document']
+        date_str = row['inserted_at'].strftime('%Y-%m-%d')
+        filename = f"({profile_id}_{cas_rn})_{date_str}_versions.txt"
+        filepath = os.path.join(base_output_directory, filename)
 
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json_str = json.dumps(document)
-        file.write(json_str)
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json_str = json.dumps(document)
+            file.write(json_str)
 
-    print(f"Saved document for profile_id {profile_id} and cas_rn {cas_rn} to {filepath}")
+        print(f"Saved document for profile_id {profile_id} and cas_rn {cas_rn} to {filepath}")
 
 process_directory(base_output_directory, individual_statements_directory)
 process_and_compile_files(individual_statements_directory, compiled_statements_directory)
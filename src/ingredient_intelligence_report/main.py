@@ -1,7 +1,13 @@
+import ast
+import hashlib
+import importlib
+import json
 import os
-import shutil
-import subprocess
-import time
+from datetime import datetime
+
+import pandas as pd
+
+from utilities import columnar, data_manipulation, snapshots
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.abspath(os.path.join(script_dir, '../../'))
@@ -9,84 +15,227 @@ root_dir = os.path.abspath(os.path.join(script_dir, '../../'))
 file_paths = {
     "01_cas_cleaning": {
         "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/01_cas_cleaning_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/01_cas_cleaning_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/02_fetch_additional_casrns_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/01_cas_cleaning_output.parquet')
     },
     "02_fetch_additional_casrns": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/02_fetch_additional_casrns_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/02_fetch_additional_casrns_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/03_fetch_data_cf_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/02_fetch_additional_casrns_output.parquet')
     },
     "03_fetch_data_cf": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/03_fetch_data_cf_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/03_fetch_data_cf_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/04_fetch_data_pharos_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/03_fetch_data_cf_output.parquet')
     },
     "04_fetch_data_pharos": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/04_fetch_data_pharos_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/04_fetch_data_pharos_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/05_gathered_data_merge_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/04_fetch_data_pharos_output.parquet')
     },
     "05_gathered_data_merge": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/05_gathered_data_merge_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/05_gathered_data_merge_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/06_gathered_data_report_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/05_gathered_data_merge_output.parquet')
     },
     "06_gathered_data_report": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/06_gathered_data_report_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/06_gathered_data_report_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/07_report_breakdown_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/06_gathered_data_report_output.parquet')
     },
     "07_report_breakdown": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/07_report_breakdown_input.xlsx'),
-        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/07_report_breakdown_output.xlsx'),
-        "next_input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/08_report_formatting_input.xlsx')
+        "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/07_report_breakdown_output.xlsx')
     },
     "08_report_formatting": {
-        "input": os.path.join(root_dir, 'data/ingredient_intelligence_reports/08_report_formatting_input.xlsx'),
         "output": os.path.join(root_dir, 'data/ingredient_intelligence_reports/08_report_formatting_output.xlsx')
     }
 }
 
-def run_script(script_name):
-    """
-    Runs a specified script and handles output copying if necessary.
-    
-    :param script_name: Name of the script to run (without the .py extension)
-    :type script_name: str
-    """
+# Set to 1 to also write every stage's output as a checkpoint file; otherwise only the final report is written.
+# Checkpoints of stages 01-06 are Parquet (see utilities.columnar to convert them to .xlsx).
+DEBUG_ARTIFACTS_ENV = 'CFKIT_DEBUG_ARTIFACTS'
+
+# Stage script -> function taking the previous stage's result (DataFrame, or Workbook from stage 07 on).
+stages = {
+    "01_cas_cleaning": "analyze_cas_frame",
+    "02_fetch_additional_casrns": "process_cas_frame",
+    "03_fetch_data_cf": "gather_data_frame",
+    "04_fetch_data_pharos": "fetch_pharos_frame",
+    "05_gathered_data_merge": "merge_gathered_frame",
+    "06_gathered_data_report": "build_report_frame",
+    "07_report_breakdown": "build_breakdown_workbook",
+    "08_report_formatting": "format_report"
+}
+
+# Cached stages (see reference_data) keep their result and a manifest here, so unchanged stages are skipped on the next run.
+cache_dir = os.path.join(root_dir, 'data/cache/ingredient_intelligence')
+pharos_file = os.path.join(root_dir, 'assets/pharos.xlsx')
+
+# Set to 1 to rerun every stage, ignoring the cached results.
+REFRESH_ENV = 'CFKIT_PIPELINE_REFRESH'
+
+# Stage script -> reference snapshots its result depends on. Only these stages are cached; stage 03
+# queries many tables directly and always runs.
+reference_data = {
+    "01_cas_cleaning": ["profiles_prod", "pharos"],
+    "02_fetch_additional_casrns": [],
+    "04_fetch_data_pharos": ["pharos"],
+    "05_gathered_data_merge": [],
+    "06_gathered_data_report": []
+}
+
+# Stage script -> (loader function, keyword argument) of the query data it reads directly. The data
+# is loaded once per run, fingerprinted into the stage manifest and handed to the stage function.
+live_data = {
+    "02_fetch_additional_casrns": ("fetch_all_profiles", "all_profiles")
+}
+
+# Utility modules and SQL files a stage uses are part of its code version.
+utilities_dir = os.path.join(root_dir, 'src/utilities')
+sql_dir = os.path.join(root_dir, 'assets/ingredient_intelligence_report')
+
+def load_stage(script_name):
+    return importlib.import_module(f"ingredient_intelligence_report.scripts.{script_name}")
+
+def debug_artifacts():
+    return os.environ.get(DEBUG_ARTIFACTS_ENV, '').lower() in ('1', 'true', 'yes')
+
+def save_result(result, output_file):
+    if isinstance(result, pd.DataFrame):
+        columnar.write_frame(result, output_file)
+    else:
+        result.save(output_file)
+    print(f"Saved {output_file}.")
+
+def refresh_env():
+    return os.environ.get(REFRESH_ENV, '').lower() in ('1', 'true', 'yes')
+
+def imported_utilities(path):
+    """Names of the utilities modules a source file imports, directly or through other utilities modules."""
+    found, pending = set(), [path]
+    while pending:
+        with open(pending.pop(), 'r') as file:
+            tree = ast.parse(file.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name.split('.')[1] for alias in node.names if alias.name.startswith('utilities.')]
+            elif isinstance(node, ast.ImportFrom) and node.module == 'utilities':
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and (node.module or '').startswith('utilities.'):
+                names = [node.module.split('.')[1]]
+            else:
+                continue
+            for name in names:
+                module_path = os.path.join(utilities_dir, f"{name}.py")
+                if name not in found and os.path.exists(module_path):
+                    found.add(name)
+                    pending.append(module_path)
+    return sorted(found)
+
+def code_version(script_name):
+    """Hash of the stage script, its SQL file (if any) and the utilities modules it imports."""
     script_path = os.path.join(script_dir, 'scripts', f"{script_name}.py")
-    print(f"Running {script_name}.py...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed {script_name}.py.")
-    time.sleep(2)
-
-    if 'next_input' in file_paths[script_name]:
-        output = file_paths[script_name]['output']
-        next_input = file_paths[script_name]['next_input']
-        print(f"Checking if {output} exists...")
-        if os.path.exists(output):
-            shutil.copy2(output, next_input)
-            print(f"Copied and renamed {output} to {next_input}.")
+    paths = [script_path, os.path.join(sql_dir, f"{script_name}.sql")]
+    paths += [os.path.join(utilities_dir, f"{name}.py") for name in imported_utilities(script_path)]
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+def reference_versions(script_name):
+    """Current versions of the snapshots a stage reads, refreshing them first."""
+    versions = {}
+    for name in reference_data[script_name]:
+        if name == 'pharos':
+            versions[name] = snapshots.refresh_pharos(pharos_file)
         else:
-            print(f"File {output} does not exist. Copy operation skipped.")
+            versions[name] = snapshots.refresh_profiles(name.split('_', 1)[1])
+    return versions
+
+def load_live_data(script_name):
+    """The query data a stage reads directly (see live_data), or None."""
+    if script_name not in live_data:
+        return None
+    loader, _ = live_data[script_name]
+    return getattr(load_stage(script_name), loader)()
+
+def stage_manifest(script_name, df_input, live=None):
+    manifest = {
+        'input': data_manipulation.dataframe_fingerprint(df_input),
+        'code': code_version(script_name),
+        'reference_data': reference_versions(script_name)
+    }
+    if live is not None:
+        manifest['live_data'] = data_manipulation.dataframe_fingerprint(live)
+    return manifest
+
+def cache_paths(script_name):
+    return (os.path.join(cache_dir, f"{script_name}.parquet"),
+            os.path.join(cache_dir, f"{script_name}.json"))
 
-def run_all_scripts():
+def cached_result(script_name, manifest):
+    """The stage's stored result if it was produced from the same manifest, else None."""
+    result_path, manifest_path = cache_paths(script_name)
+    try:
+        with open(manifest_path, 'r') as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if {key: stored.get(key) for key in manifest} != manifest or not os.path.exists(result_path):
+        return None
+    return columnar.read_frame(result_path)
+
+def store_result(script_name, manifest, result):
+    """Store a completed stage's result and manifest, and return the result as read back."""
+    result_path, manifest_path = cache_paths(script_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    columnar.write_frame(result, result_path)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(dict(manifest, completed_at=datetime.now().isoformat(timespec='seconds')), file, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return columnar.read_frame(result_path)
+
+def run_all_scripts(refresh=False):
     """
-    Runs all scripts in sequence as specified.
+    Runs all stages in sequence in this process, handing each stage's result to the next in memory.
+    Only the final report is written, unless CFKIT_DEBUG_ARTIFACTS is set.
+
+    Stages 01, 02 and 04-06 are skipped when their input data, code (including SQL and utilities)
+    and reference data are unchanged since their last completed run; their stored result is used
+    instead, so a run resumes from the first stage that changed. Stage 03 queries the database and
+    always runs; stages 07-08 only build the workbook and always run.
+    Pass refresh=True (or set CFKIT_PIPELINE_REFRESH) to rerun everything.
+
+    If the stage 02 review is aborted the run stops there; the answers given so far are kept and
+    the next run continues the review.
     """
-    scripts = [
-        '01_cas_cleaning',
-        '02_fetch_additional_casrns',
-        '03_fetch_data_cf',
-        '04_fetch_data_pharos',
-        '05_gathered_data_merge',
-        '06_gathered_data_report',
-        '07_report_breakdown',
-        '08_report_formatting'
-    ]
-    for script in scripts:
-        run_script(script)
+    refresh = refresh or refresh_env()
+    review_aborted = load_stage('02_fetch_additional_casrns').ReviewAborted
+    cas_cleaning = load_stage('01_cas_cleaning')
+    result = cas_cleaning.read_input(file_paths['01_cas_cleaning']['input'], cas_cleaning.cas_column)
+
+    for script_name, function in stages.items():
+        if isinstance(result, pd.DataFrame):
+            result = data_manipulation.missing_as_nan(result)
+
+        live = load_live_data(script_name)
+        manifest = stage_manifest(script_name, result, live) if script_name in reference_data else None
+        cached = cached_result(script_name, manifest) if manifest and not refresh else None
+        if cached is not None:
+            print(f"Skipping {script_name} (unchanged since its last run).")
+            result = cached
+            continue
+
+        print(f"Running {script_name}...")
+        try:
+            kwargs = {live_data[script_name][1]: live} if live is not None else {}
+            result = getattr(load_stage(script_name), function)(result, **kwargs)
+        except review_aborted as aborted:
+            if debug_artifacts():
+                save_result(aborted.df, file_paths[script_name]['output'])
+            print(f"Stopped at {script_name}. Run again to continue from there.")
+            return
+        print(f"Completed {script_name}.")
+        if manifest:
+            result = store_result(script_name, manifest, result)
+        if debug_artifacts() and script_name != '08_report_formatting':
+            save_result(result, file_paths[script_name]['output'])
+
+    save_result(result, file_paths['08_report_formatting']['output'])
     print("Completed all scripts.")
 
 if __name__ == "__main__":
@@ -1,27 +1,72 @@
+import numpy as np
 import pandas as pd
 import utilities.connections as connections
+from utilities import columnar, data_manipulation
 import sqlalchemy
 from tqdm import tqdm
 import os
 import json
 
-conn = connections.get_db_engine('prod')
-
 script_dir = os.path.dirname(os.path.abspath(__file__))
-input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/02_fetch_additional_casrns_input.xlsx')
-output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/02_fetch_additional_casrns_output.xlsx')
+input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/01_cas_cleaning_output.parquet')
+output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/02_fetch_additional_casrns_output.parquet')
+# Interactive review answers, one file per stage input, so an aborted review resumes where it stopped.
+review_answers_dir = os.path.normpath(os.path.join(script_dir, '../../../data/cache/ingredient_intelligence/review_answers'))
 
 sql_file_path = os.path.join(os.path.dirname(__file__), '../../../assets/ingredient_intelligence_report/02_fetch_additional_casrns.sql')
-with open(sql_file_path, 'r') as file:
-    query = file.read()
+
+class ReviewAborted(Exception):
+    """'ABORT PROCESS' was entered during the review; df holds the state reached so far."""
+
+    def __init__(self, df):
+        super().__init__("Review aborted by user")
+        self.df = df
+
+def review_answers_path(df):
+    return os.path.join(review_answers_dir, f"{data_manipulation.dataframe_fingerprint(df)}.json")
+
+def load_review_answers(path):
+    """'row position|suggested CAS' -> answer given in an earlier run on the same input."""
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_review_answers(path, answers):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(answers, file, indent=2)
+    os.replace(tmp_path, path)
+
+def review_key(position, suggested_cas):
+    # Rows are identified by their position in the input, which the answers file's fingerprint pins down.
+    return f"{position}|{suggested_cas}"
+
+def order_columns(df):
+    cols = (
+        ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS'] +
+        [col for col in df.columns if col not in ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS']]
+    )
+    return df[cols]
 
 def fetch_all_profiles():
+    with open(sql_file_path, 'r') as file:
+        query = file.read()
+    conn = connections.get_db_engine('prod')
     result = pd.read_sql(query, conn)
     return result
 
-def get_original_profile_data(cas):
-    """Fetch profile data for the original CAS using a direct query"""
-    query = f"""
+def get_original_profiles(cas_numbers):
+    """
+    Profile data for the original CAS numbers of the review queue, fetched in one query
+    before the first prompt: cas_rn -> profile row (the first one if several share it).
+    """
+    cas_numbers = sorted(set(cas_numbers))
+    if not cas_numbers:
+        return {}
+    query = """
     SELECT 
         cas_rn, 
         name,
@@ -32,14 +77,13 @@ def get_original_profile_data(cas):
         manual_rollup_score,
         list_based_c2c_score
     FROM profiles
-    WHERE cas_rn = %s
-    LIMIT 1
+    WHERE cas_rn = ANY(%(cas_numbers)s)
     """
     
-    result = pd.read_sql(query, conn, params=(cas,))
-    if not result.empty:
-        return result.iloc[0]
-    return None
+    conn = connections.get_db_engine('prod')
+    result = pd.read_sql(query, conn, params={'cas_numbers': cas_numbers})
+    result = result.drop_duplicates(subset='cas_rn')
+    return {row['cas_rn']: row for _, row in result.iterrows()}
 
 def display_profile_info(profile_data, original_cas=None):
     """Display profile information in a formatted way"""
@@ -62,159 +106,147 @@ def display_profile_info(profile_data, original_cas=None):
         print("*** CHA IN PROGRESS ***")
     print("-" * 50)
 
-def select_relevant_profile(cas, all_profiles):
+def profile_priority(profiles):
+    """
+    Rank of each profile when several share an additional CAS, lowest first: not screening only,
+    then with a list-based hazard score, then with a manual hazard band other than '?', then the rest.
+    """
+    return np.select(
+        [profiles['status'] != 'screening_only',
+         profiles['list_based_hazard_score'].notna(),
+         profiles['manual_hazard_band_score'] != '?'],
+        [0, 1, 2], default=3)
+
+def build_profile_index(all_profiles):
+    """
+    additional CAS -> the most relevant profile (row) listing it, by profile_priority and then
+    query order. Parses each profile's additional_casrn once.
+    """
+    additional_cas = all_profiles['additional_casrn'].map(lambda x: json.loads(x).get('additional_casrn'))
+    ranked = all_profiles.assign(_additional_cas=additional_cas.values, _priority=profile_priority(all_profiles))
+    ranked = ranked[ranked['_additional_cas'].map(lambda cas: isinstance(cas, str))]
+    ranked = ranked.sort_values('_priority', kind='stable').drop_duplicates('_additional_cas')
+    return {cas: row.drop(['_additional_cas', '_priority'])
+            for cas, (_, row) in zip(ranked['_additional_cas'], ranked.iterrows())}
+
+def select_relevant_profile(cas, profile_index):
     """Return both the selected CAS and the full profile data"""
-    profiles = all_profiles[
-        all_profiles['additional_casrn'].apply(lambda x: json.loads(x).get('additional_casrn')) == cas]
-
-    if not profiles.empty:
-        not_screening_only = profiles[profiles['status'] != 'screening_only']
-        if not not_screening_only.empty:
-            selected = not_screening_only.iloc[0]
-            return selected['cas_rn'], selected
-            
-        with_list_score = profiles.dropna(subset=['list_based_hazard_score'])
-        if not with_list_score.empty:
-            selected = with_list_score.iloc[0]
-            return selected['cas_rn'], selected
-            
-        with_manual_score = profiles[profiles['manual_hazard_band_score'] != '?']
-        if not with_manual_score.empty:
-            selected = with_manual_score.iloc[0]
-            return selected['cas_rn'], selected
-            
-        selected = profiles.iloc[0]
-        return selected['cas_rn'], selected
+    selected = profile_index.get(cas) if isinstance(cas, str) else None
+    if selected is None:
+        return None, None
+    return selected['cas_rn'], selected
 
-    return None, None
+def process_cas_frame(df, all_profiles=None):
+    """
+    Stage 02: suggest (and optionally apply) the most relevant profile CAS for each Final CAS
+    that is an additional CAS of another profile. Returns the frame; 'ABORT PROCESS' raises
+    ReviewAborted with the state reached so far.
 
-def process_cas_numbers(input_file, output_file):
-    df = pd.read_excel(input_file)
-    
+    all_profiles is the result of fetch_all_profiles, fetched here when not given.
+
+    Interactive answers are saved per row as they are given; after 'ABORT PROCESS', a later run
+    on the same input reuses them and only asks about the rows not yet answered.
+    """
+    answers_path = review_answers_path(df)
+    df = df.copy()
     df['replaced?'] = False
     df['original_Final CAS'] = df['Final CAS']
     df['suggested_Final CAS'] = None
 
-    all_profiles = fetch_all_profiles()
-
     user_choice = input("Do you want to replace Final CAS numbers with alternative CAS numbers? (1: No, 2: Yes, 3: Interactive): ").strip()
     
     if user_choice == "ABORT PROCESS":
         print("\nProcess aborted by user. Saving current state...")
-        df.to_excel(output_file, index=False)
-        print(f"Output saved to: {output_file}")
-        return
-    
-    if user_choice == '1':
-        for index, row in tqdm(df.iterrows(), total=df.shape[0], desc="Processing CAS numbers"):
-            new_cas, _ = select_relevant_profile(row['Final CAS'], all_profiles)
-            
-            if new_cas:
-                df.at[index, 'suggested_Final CAS'] = new_cas
-    
-    elif user_choice == '2':
-        for index, row in tqdm(df.iterrows(), total=df.shape[0], desc="Processing CAS numbers"):
-            new_cas, _ = select_relevant_profile(row['Final CAS'], all_profiles)
-            
-            if new_cas:
-                df.at[index, 'suggested_Final CAS'] = new_cas
-                df.at[index, 'Final CAS'] = new_cas
-                df.at[index, 'replaced?'] = True
+        raise ReviewAborted(order_columns(df))
+
+    profile_index = build_profile_index(all_profiles if all_profiles is not None else fetch_all_profiles())
+    suggestions = {}
+    for index, cas in tqdm(df['Final CAS'].items(), total=df.shape[0], desc="Processing CAS numbers"):
+        new_cas, profile_data = select_relevant_profile(cas, profile_index)
+        if new_cas:
+            suggestions[index] = (new_cas, profile_data)
+
+    if user_choice == '2':
+        for index, (new_cas, _) in suggestions.items():
+            df.at[index, 'suggested_Final CAS'] = new_cas
+            df.at[index, 'Final CAS'] = new_cas
+            df.at[index, 'replaced?'] = True
     
     elif user_choice == '3':
-        df_no_replace = df.copy()
-        df_replace = df.copy()
-        profile_data_map = {}
+        print(f"\nFound {len(suggestions)} items with replacement options.")
         
-        for index, row in tqdm(df_no_replace.iterrows(), total=df_no_replace.shape[0], desc="Processing CAS numbers (no replace)"):
-            new_cas, profile_data = select_relevant_profile(row['Final CAS'], all_profiles)
-            
-            if new_cas:
-                df_no_replace.at[index, 'suggested_Final CAS'] = new_cas
-                profile_data_map[index] = profile_data
+        answers = load_review_answers(answers_path)
+        if answers:
+            print(f"Reusing {len(answers)} answers from an earlier run on this input.")
+        positions = {index: position for position, index in enumerate(df.index)}
+        original_profiles = get_original_profiles(
+            df.at[index, 'original_Final CAS'] for index, (new_cas, _) in suggestions.items()
+            if review_key(positions[index], new_cas) not in answers)
         
-        for index, row in tqdm(df_replace.iterrows(), total=df_replace.shape[0], desc="Processing CAS numbers (replace)"):
-            new_cas, _ = select_relevant_profile(row['Final CAS'], all_profiles)
+        for idx, (index, (new_cas, replacement_profile_data)) in enumerate(suggestions.items()):
+            row = df.loc[index]
+            original_cas = row['original_Final CAS']
+            answer_key = review_key(positions[index], new_cas)
             
-            if new_cas:
-                df_replace.at[index, 'suggested_Final CAS'] = new_cas
-                df_replace.at[index, 'Final CAS'] = new_cas
-                df_replace.at[index, 'replaced?'] = True
-        
-        df_no_replace_filtered = df_no_replace[df_no_replace['suggested_Final CAS'].notna()]
-        df_replace_filtered = df_replace[df_replace['replaced?'] == True]
-        
-        print(f"\nFound {len(df_no_replace_filtered)} items with replacement options.")
-        
-        df_final = df.copy()
-        
-        for idx, (index, row_no_replace) in enumerate(df_no_replace_filtered.iterrows()):
-            row_replace = df_replace_filtered.loc[index]
+            if answer_key in answers:
+                choice = answers[answer_key]
+            else:
+                print(f"\n{'='*80}")
+                print(f"Item {idx+1} of {len(suggestions)}")
             
-            print(f"\n{'='*80}")
-            print(f"Item {idx+1} of {len(df_no_replace_filtered)}")
+                if 'ingr_name' in row:
+                    print(f"Ingredient name (from input): {row['ingr_name']}")
             
-            if 'ingr_name' in row_no_replace:
-                print(f"Ingredient name (from input): {row_no_replace['ingr_name']}")
+                original_profile_data = original_profiles.get(original_cas)
             
-            original_cas = row_no_replace['original_Final CAS']
-            original_profile_data = get_original_profile_data(original_cas)
+                print("\nCURRENT PROFILE:")
+                if original_profile_data is not None:
+                    display_profile_info(original_profile_data.to_dict())
+                else:
+                    print(f"CAS: {original_cas} (No ChemFORWARD profile)")
             
-            print("\nCURRENT PROFILE:")
-            if original_profile_data is not None:
-                display_profile_info(original_profile_data.to_dict())
-            else:
-                print(f"CAS: {original_cas} (No ChemFORWARD profile)")
-            
-            print("\nSUGGESTED REPLACEMENT:")
-            replacement_profile_data = profile_data_map.get(index)
-            if replacement_profile_data is not None:
+                print("\nSUGGESTED REPLACEMENT:")
                 display_profile_info(replacement_profile_data.to_dict(), original_cas=original_cas)
             
-            print("\n" + "="*80)
-            choice = input("Replace this CAS? (y/n): ").strip()
+                print("\n" + "="*80)
+                choice = input("Replace this CAS? (y/n): ").strip()
+            
+                if choice == "ABORT PROCESS":
+                    print("\nProcess aborted by user. Saving current state...")
+                    df = order_columns(df)
+                    replaced_count = df['replaced?'].sum()
+                    print(f"\nSummary: Replaced {replaced_count} items before aborting.")
+                    print(f"Answers so far are saved in {answers_path}; run again to continue the review.")
+                    raise ReviewAborted(df)
             
-            if choice == "ABORT PROCESS":
-                print("\nProcess aborted by user. Saving current state...")
-                df = df_final
-                cols = (
-                    ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS'] +
-                    [col for col in df.columns if col not in ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS']]
-                )
-                df = df[cols]
-                df.to_excel(output_file, index=False)
-                print(f"Output saved to: {output_file}")
-                replaced_count = df['replaced?'].sum()
-                print(f"\nSummary: Replaced {replaced_count} items before aborting.")
-                return
+                answers[answer_key] = choice
+                save_review_answers(answers_path, answers)
             
+            df.at[index, 'suggested_Final CAS'] = new_cas
             if choice.lower() == 'y':
-                df_final.at[index, 'Final CAS'] = row_replace['Final CAS']
-                df_final.at[index, 'replaced?'] = True
-                df_final.at[index, 'suggested_Final CAS'] = row_replace['suggested_Final CAS']
-            else:
-                df_final.at[index, 'suggested_Final CAS'] = row_no_replace['suggested_Final CAS']
-        
-        df = df_final
+                df.at[index, 'Final CAS'] = new_cas
+                df.at[index, 'replaced?'] = True
     
     else:
-        print("Invalid choice. Using option 1 (no replacement).")
-        for index, row in tqdm(df.iterrows(), total=df.shape[0], desc="Processing CAS numbers"):
-            new_cas, _ = select_relevant_profile(row['Final CAS'], all_profiles)
-            
-            if new_cas:
-                df.at[index, 'suggested_Final CAS'] = new_cas
+        if user_choice != '1':
+            print("Invalid choice. Using option 1 (no replacement).")
+        for index, (new_cas, _) in suggestions.items():
+            df.at[index, 'suggested_Final CAS'] = new_cas
     
-    cols = (
-        ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS'] +
-        [col for col in df.columns if col not in ['replaced?', 'original_Final CAS', 'suggested_Final CAS', 'Final CAS']]
-    )
-    df = df[cols]
+    df = order_columns(df)
 
-    df.to_excel(output_file, index=False)
-    
     replaced_count = df['replaced?'].sum()
     total_count = len(df)
     print(f"\nSummary: Replaced {replaced_count} out of {total_count} CAS numbers.")
+    return df
+
+def process_cas_numbers(input_file, output_file):
+    try:
+        df = process_cas_frame(data_manipulation.missing_as_nan(columnar.read_frame(input_file)))
+    except ReviewAborted as aborted:
+        df = aborted.df
+    columnar.write_frame(df, output_file)
+    print(f"Output saved to: {output_file}")
 
-process_cas_numbers(input_file, output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    process_cas_numbers(input_file, output_file)
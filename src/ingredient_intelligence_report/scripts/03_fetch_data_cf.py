@@ -1,14 +1,14 @@
 import json
-import openpyxl
 import pandas as pd
 import sqlalchemy
 import os
 
 import utilities.connections as connections
+from utilities import cas_handling, columnar, data_manipulation
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/03_fetch_data_cf_input.xlsx')
-output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/03_fetch_data_cf_output.xlsx')
+input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/02_fetch_additional_casrns_output.parquet')
+output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/03_fetch_data_cf_output.parquet')
 cas_column = 'Final CAS'
 
 sql_file_path = os.path.join(os.path.dirname(__file__), '../../../assets/ingredient_intelligence_report/03_fetch_data_cf.sql')
@@ -19,16 +19,20 @@ def get_data(conn, query):
     return pd.read_sql(query, conn)
 
 
-def gather_data(file_path, cas_column):
+def read_input(file_path, cas_column):
     dtype = {cas_column: str}
 
-    if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-        data = pd.read_excel(file_path, dtype=dtype)
+    if file_path.endswith('.parquet'):
+        return data_manipulation.missing_as_nan(columnar.read_frame(file_path))
+    elif file_path.endswith('.xlsx') or file_path.endswith('.xls'):
+        return pd.read_excel(file_path, dtype=dtype)
     elif file_path.endswith('.csv'):
-        data = pd.read_csv(file_path, dtype=dtype)
+        return pd.read_csv(file_path, dtype=dtype)
     else:
-        raise ValueError("Invalid file format. Please provide an Excel (.xlsx, .xls) or CSV (.csv) file.")
+        raise ValueError("Invalid file format. Please provide a Parquet (.parquet), Excel (.xlsx, .xls) or CSV (.csv) file.")
 
+def gather_data_frame(data, cas_column=cas_column):
+    """Stage 03: ChemFORWARD profile data (cf_ columns) merged onto the rows by Final CAS."""
     conn = connections.get_db_engine('prod')
     db_data = get_data(conn, REPORT_INGREDIENT_CAS)
 
@@ -36,22 +40,15 @@ def gather_data(file_path, cas_column):
         lambda x: ', '.join(i['additional_casrn'] for i in json.loads(x)) if isinstance(x, str) and x.strip() != '[]' else x)
     db_data.columns = ['cf_' + col for col in db_data.columns]
 
-    data = pd.merge(data, db_data, how='left', left_on=cas_column, right_on='cf_cas_rn')
+    data = cas_handling.merge_on_cas(data, db_data, cas_column, 'cf_cas_rn', how='left')
 
     data['CF Data'] = data['cf_cas_rn'].apply(lambda x: 'no_cf_data' if pd.isnull(x) else 'cf_data')
 
     return data
 
+def gather_data(file_path, cas_column):
+    return gather_data_frame(read_input(file_path, cas_column), cas_column)
 
-result = gather_data(input_file, cas_column)
-
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    result.to_excel(writer, index=False, sheet_name='Sheet1')
-
-wb = openpyxl.load_workbook(output_file)
-ws = wb.active
-for row in ws.iter_rows(min_row=2, max_row=len(result) + 1):
-    cas_cell = row[0]
-    cas_cell.number_format = '@'
+if __name__ == "__main__":
+    columnar.write_frame(gather_data(input_file, cas_column), output_file)
 
-wb.save(output_file)
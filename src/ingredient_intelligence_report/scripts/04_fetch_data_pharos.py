@@ -2,24 +2,32 @@ import numpy as np
 import pandas as pd
 import os
 
+from utilities import cas_handling, columnar, data_manipulation, snapshots
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
-input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/04_fetch_data_pharos_input.xlsx')
+input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/03_fetch_data_cf_output.parquet')
 pharos_file = os.path.join(script_dir, '../../../assets/pharos.xlsx')
-output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/04_fetch_data_pharos_output.xlsx')
+output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/04_fetch_data_pharos_output.parquet')
 cas_column = 'Final CAS'
 
-df_input = pd.read_excel(input_file)
-df_pharos = pd.read_excel(pharos_file)
+def fetch_pharos_frame(df_input, cas_column=cas_column):
+    """Stage 04: Pharos data (pharos_ columns) merged onto the rows without ChemFORWARD data."""
+    df_input = df_input.copy()
+    df_pharos = snapshots.load_pharos(pharos_file)
+
+    df_input['query_required'] = (df_input['CF Data'] == 'no_cf_data') & (
+        ~df_input[cas_column].isin(['invalid_cas', 'no_cas']))
 
-df_input['query_required'] = (df_input['CF Data'] == 'no_cf_data') & (
-    ~df_input[cas_column].isin(['invalid_cas', 'no_cas']))
+    df_merged = cas_handling.merge_on_cas(df_input, df_pharos, cas_column, 'casrn', how='left')
 
-df_merged = pd.merge(df_input, df_pharos, how='left', left_on=cas_column, right_on='casrn')
+    df_merged["Pharos Data"] = np.where(df_merged['query_required'] & df_merged['casrn'].notna(), "pharos_data",
+                                        "no_pharos_data")
 
-df_merged["Pharos Data"] = np.where(df_merged['query_required'] & df_merged['casrn'].notna(), "pharos_data",
-                                    "no_pharos_data")
+    pharos_columns = df_pharos.columns.tolist()
+    df_merged.rename(columns={col: 'pharos_' + col for col in pharos_columns}, inplace=True)
 
-pharos_columns = df_pharos.columns.tolist()
-df_merged.rename(columns={col: 'pharos_' + col for col in pharos_columns}, inplace=True)
+    return df_merged
 
-df_merged.to_excel(output_file, index=False)
+if __name__ == "__main__":
+    df_input = data_manipulation.missing_as_nan(columnar.read_frame(input_file))
+    columnar.write_frame(fetch_pharos_frame(df_input), output_file)
@@ -1,96 +1,101 @@
 import pandas as pd
-from openpyxl import load_workbook
+from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import os
 
+from utilities import columnar, data_manipulation
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
-input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/07_report_breakdown_input.xlsx')
+input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/06_gathered_data_report_output.parquet')
 output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/07_report_breakdown_output.xlsx')
 
-df = pd.read_excel(input_file)
-
-if 'count' not in df.columns:
-    df['count'] = 1
-else:
-    df['count'] = df['count'].fillna(1)
-
-df['Chemical Count'] = df.groupby('Final CAS')['count'].transform('sum')
+def write_rows(ws, df):
+    rows = dataframe_to_rows(df, index=False, header=True)
 
-wb = load_workbook(filename=input_file)
-ws_source = wb.active
-
-ws_source.title = "Source+Data"
+    for r_idx, row in enumerate(rows, 1):
+        for c_idx, value in enumerate(row, 1):
+            ws.cell(row=r_idx, column=c_idx, value=value)
 
-conditions = {
-    "Low Rated": ["F", "D"],
-    "Data Gaps": "?",
-    "Unique Low Rated": ["F", "D"],
-    "Unique Data Gaps": "?"
-}
+def build_breakdown_workbook(df):
+    """
+    Stage 07: report workbook with the source rows and the low rated, data gap and unidentified
+    breakdowns (all rows and unique CAS numbers). Returned in memory for stage 08 to format.
+    """
+    wb = Workbook()
+    ws_source = wb.active
+    ws_source.title = "Source+Data"
+    write_rows(ws_source, df)
+
+    df = df.copy()
+    if 'count' not in df.columns:
+        df['count'] = 1
+    else:
+        df['count'] = df['count'].fillna(1)
 
-for sheet_name, condition in conditions.items():
-    ws = wb.create_sheet(title=sheet_name)
+    df['Chemical Count'] = df.groupby('Final CAS')['count'].transform('sum')
 
-    if isinstance(condition, list):
-        df_filtered = df[df['Hazard Band'].isin(condition)]
-    else:
-        df_filtered = df[df['Hazard Band'] == condition]
+    conditions = {
+        "Low Rated": ["F", "D"],
+        "Data Gaps": "?",
+        "Unique Low Rated": ["F", "D"],
+        "Unique Data Gaps": "?"
+    }
 
-    if sheet_name.startswith("Unique"):
-        df_filtered = df_filtered.drop_duplicates(subset='Final CAS')
-        cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
-        df_filtered = df_filtered.drop(columns=cols_to_drop)
+    for sheet_name, condition in conditions.items():
+        ws = wb.create_sheet(title=sheet_name)
 
-    df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
+        if isinstance(condition, list):
+            df_filtered = df[df['Hazard Band'].isin(condition)]
+        else:
+            df_filtered = df[df['Hazard Band'] == condition]
 
-    rows = dataframe_to_rows(df_filtered, index=False, header=True)
+        if sheet_name.startswith("Unique"):
+            df_filtered = df_filtered.drop_duplicates(subset='Final CAS')
+            cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
+            df_filtered = df_filtered.drop(columns=cols_to_drop)
 
-    for r_idx, row in enumerate(rows, 1):
-        for c_idx, value in enumerate(row, 1):
-            ws.cell(row=r_idx, column=c_idx, value=value)
+        df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
 
-for sheet_name in ["Unidentified", "Unique Unidentified"]:
-    ws = wb.create_sheet(title=sheet_name)
+        write_rows(ws, df_filtered)
 
-    df_filtered = df[df['Ingredient Name'].isna()]
+    for sheet_name in ["Unidentified", "Unique Unidentified"]:
+        ws = wb.create_sheet(title=sheet_name)
 
-    if sheet_name.startswith("Unique"):
-        df_filtered = df_filtered.drop_duplicates(subset='Final CAS')
-        cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
-        df_filtered = df_filtered.drop(columns=cols_to_drop)
+        df_filtered = df[df['Ingredient Name'].isna()]
 
-    df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
+        if sheet_name.startswith("Unique"):
+            df_filtered = df_filtered.drop_duplicates(subset='Final CAS')
+            cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
+            df_filtered = df_filtered.drop(columns=cols_to_drop)
 
-    rows = dataframe_to_rows(df_filtered, index=False, header=True)
+        df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
 
-    for r_idx, row in enumerate(rows, 1):
-        for c_idx, value in enumerate(row, 1):
-            ws.cell(row=r_idx, column=c_idx, value=value)
+        write_rows(ws, df_filtered)
 
-ws = wb.create_sheet(title="Unique Source+Data")
+    ws = wb.create_sheet(title="Unique Source+Data")
 
-df_filtered = df.drop_duplicates(subset='Final CAS')
-cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
-df_filtered = df_filtered.drop(columns=cols_to_drop)
+    df_filtered = df.drop_duplicates(subset='Final CAS')
+    cols_to_drop = df_filtered.columns.tolist()[:df_filtered.columns.tolist().index('Chemical Count')]
+    df_filtered = df_filtered.drop(columns=cols_to_drop)
 
-df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
+    df_filtered = df_filtered.sort_values(by='Chemical Count', ascending=False)
 
-rows = dataframe_to_rows(df_filtered, index=False, header=True)
+    write_rows(ws, df_filtered)
 
-for r_idx, row in enumerate(rows, 1):
-    for c_idx, value in enumerate(row, 1):
-        ws.cell(row=r_idx, column=c_idx, value=value)
+    sheet_order = ["Source+Data",
+                   "Low Rated",
+                   "Data Gaps",
+                   "Unidentified",
+                   "Unique Source+Data",
+                   "Unique Low Rated",
+                   "Unique Data Gaps",
+                   "Unique Unidentified"
+    ]
 
-sheet_order = ["Source+Data",
-               "Low Rated",
-               "Data Gaps",
-               "Unidentified",
-               "Unique Source+Data",
-               "Unique Low Rated",
-               "Unique Data Gaps",
-               "Unique Unidentified"
-]
+    wb._sheets = [wb[sheet_name] for sheet_name in sheet_order]
 
-wb._sheets = [wb[sheet_name] for sheet_name in sheet_order]
+    return wb
 
-wb.save(output_file)
+if __name__ == "__main__":
+    df_input = data_manipulation.missing_as_nan(columnar.read_frame(input_file))
+    build_breakdown_workbook(df_input).save(output_file)
@@ -4,11 +4,9 @@ from openpyxl.utils import get_column_letter
 import os
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/08_report_formatting_input.xlsx')
+input_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/07_report_breakdown_output.xlsx')
 output_file = os.path.join(script_dir, '../../../data/ingredient_intelligence_reports/08_report_formatting_output.xlsx')
 
-wb = load_workbook(filename=input_file)
-
 fills = {
     'A': PatternFill(start_color="006400", end_color="006400", fill_type="solid"),
     'B': PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid"),
@@ -30,71 +28,77 @@ fills = {
 
 thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
 
-for ws in wb.worksheets:
-    for col_idx, cell in enumerate(ws[1], start=1):
-        col_letter = get_column_letter(col_idx)
-        column_name = cell.value
+def format_report(wb):
+    """Stage 08: fills, column widths, alignment and header styling of the report workbook, in place."""
+    for ws in wb.worksheets:
+        for col_idx, cell in enumerate(ws[1], start=1):
+            col_letter = get_column_letter(col_idx)
+            column_name = cell.value
+
+            for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=col_idx, max_col=col_idx):
+                for cell in row:
+                    cell.fill = fills.get(cell.value, PatternFill())
 
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=col_idx, max_col=col_idx):
-            for cell in row:
-                cell.fill = fills.get(cell.value, PatternFill())
+            if column_name == 'Final CAS':
+                ws.column_dimensions[col_letter].width = 12
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+                    cell.number_format = '@'
+            elif column_name == 'Additional CAS':
+                ws.column_dimensions[col_letter].width = 12
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='left')
+            elif column_name == 'EC Number':
+                ws.column_dimensions[col_letter].width = 12
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='left')
+            elif column_name == 'Ingredient Name':
+                ws.column_dimensions[col_letter].width = 40
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='left')
+            elif column_name == 'INCI':
+                ws.column_dimensions[col_letter].width = 30
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='left')
+            elif column_name == 'Hazard Band':
+                ws.column_dimensions[col_letter].width = 12
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+            elif column_name == 'C2C Score':
+                ws.column_dimensions[col_letter].width = 12
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+            elif column_name == 'ChemFORWARD Status':
+                ws.column_dimensions[col_letter].width = 30
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+            elif column_name == 'SCIL Status':
+                ws.column_dimensions[col_letter].width = 14
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+            elif column_name == 'TCO Status':
+                ws.column_dimensions[col_letter].width = 14
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
+            elif column_name in ['replaced?',
+                                 'original_Final CAS',
+                                 'cas',
+                                 'Count',
+                                 'count',
+                                 'Valid Original',
+                                 'Corrected CAS',
+                                 'Typo Corrected CAS',
+                                 'Final Valid',
+                                 'Chemical Count'
+                ]:
+                for cell in ws[col_letter]:
+                    cell.alignment = Alignment(horizontal='center')
 
-        if column_name == 'Final CAS':
-            ws.column_dimensions[col_letter].width = 12
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-                cell.number_format = '@'
-        elif column_name == 'Additional CAS':
-            ws.column_dimensions[col_letter].width = 12
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='left')
-        elif column_name == 'EC Number':
-            ws.column_dimensions[col_letter].width = 12
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='left')
-        elif column_name == 'Ingredient Name':
-            ws.column_dimensions[col_letter].width = 40
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='left')
-        elif column_name == 'INCI':
-            ws.column_dimensions[col_letter].width = 30
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='left')
-        elif column_name == 'Hazard Band':
-            ws.column_dimensions[col_letter].width = 12
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-        elif column_name == 'C2C Score':
-            ws.column_dimensions[col_letter].width = 12
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-        elif column_name == 'ChemFORWARD Status':
-            ws.column_dimensions[col_letter].width = 30
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-        elif column_name == 'SCIL Status':
-            ws.column_dimensions[col_letter].width = 14
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-        elif column_name == 'TCO Status':
-            ws.column_dimensions[col_letter].width = 14
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
-        elif column_name in ['replaced?',
-                             'original_Final CAS',
-                             'cas',
-                             'Count',
-                             'count',
-                             'Valid Original',
-                             'Corrected CAS',
-                             'Final Valid',
-                             'Chemical Count'
-            ]:
-            for cell in ws[col_letter]:
-                cell.alignment = Alignment(horizontal='center')
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+            cell.border = thin_border
 
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.border = thin_border
+    return wb
 
-wb.save(output_file)
+if __name__ == "__main__":
+    format_report(load_workbook(filename=input_file)).save(output_file)
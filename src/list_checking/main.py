@@ -1,11 +1,4 @@
-import os
-import subprocess
-
-def run_script(script):
-    script_path = os.path.join(os.path.dirname(__file__), "scripts", script)
-    print(f"Running {script}...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed {script}.")
+from utilities import dispatch
 
 def main():
     print("Please select which list checking script to run:")
@@ -14,7 +7,7 @@ def main():
     choice = input("Enter the number of the script to run: ")
 
     if choice == '1':
-        run_script("report_list_check.py")
+        dispatch.run_entry_point('list_checking.scripts.report_list_check')
     else:
         print("Invalid choice. Please try again.")
 
@@ -6,6 +6,8 @@ from tqdm import tqdm
 from openpyxl import load_workbook
 from openpyxl.cell import Cell
 
+from utilities import cas_handling
+
 def get_input_file():
     """Get the input file from the data directory."""
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../data/list_checking/report_list_check"))
@@ -61,7 +63,10 @@ def get_cas_column(df):
                 print(f"Column '{col_input}' not found. Please try again.")
 
 def load_list_file(file_path):
-    """Load a list file and extract the list name, sublist name, and CAS numbers."""
+    """
+    Load a list file and extract the list name, sublist name, and CAS numbers
+    (as a cas_handling.CasKeySet).
+    """
     df = pd.read_excel(file_path, header=None)
     
     list_name = None
@@ -96,7 +101,7 @@ def load_list_file(file_path):
             combined_name = list_name[:97] + "..."
     
     df_data = pd.read_excel(file_path, skiprows=data_start_row)
-    cas_numbers = set(df_data['CASRN'].dropna().astype(str))
+    cas_numbers = cas_handling.cas_key_set(df_data['CASRN'].dropna().astype(str))
     
     return combined_name, cas_numbers
 
@@ -147,23 +152,18 @@ def copy_files_to_output(input_file, lists_dir, output_dir):
 
 def process_cas_matching(df, cas_column, lists_data):
     """Process CAS matching and add columns for each list."""
-    unique_cas = df[cas_column].dropna().astype(str).unique()
+    cas = df[cas_column].astype(str).str.strip().where(df[cas_column].notna())
+    cas_keys = cas_handling.cas_key_series(cas)
     
     all_lists = []
     for list_type in ['regulatory', 'non_regulatory']:
         for list_name in sorted(lists_data[list_type].keys()):
             all_lists.append((list_type, list_name))
-            df[list_name] = ''
     
     print("\nProcessing CAS numbers...")
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Matching CAS numbers"):
-        cas = str(row[cas_column]).strip()
-        if pd.isna(cas) or cas == 'nan':
-            continue
-            
-        for list_type, list_name in all_lists:
-            if cas in lists_data[list_type][list_name]:
-                df.at[idx, list_name] = cas
+    for list_type, list_name in tqdm(all_lists, desc="Matching CAS numbers"):
+        found = cas_handling.cas_isin(cas, lists_data[list_type][list_name], keys=cas_keys)
+        df[list_name] = cas.where(found, '')
     
     return df
 
@@ -1,11 +1,9 @@
 import os
-import subprocess
+
+from utilities import dispatch
 
 def run_script(script):
-    script_path = os.path.join(os.path.dirname(__file__), "scripts", script)
-    print(f"Running {script}...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed {script}.")
+    dispatch.run_script(os.path.join(os.path.dirname(__file__), "scripts", script))
 
 def main():
     print("Please select which script to run:")
@@ -20,7 +18,7 @@ def main():
     elif choice == '2':
         run_script("split_by_delimiter.py")
     elif choice == '3':
-        run_script("excel_splitter.py")
+        dispatch.run_entry_point('small_tasks.scripts.excel_splitter')
     else:
         print("Invalid choice. Please try again.")
 
@@ -1,11 +1,10 @@
 import os
-import subprocess
+
+from utilities import dispatch
 
 def run_script():
     script_path = os.path.join(os.path.dirname(__file__), "scripts", "user_report.py")
-    print(f"Running user_report.py...")
-    subprocess.run(["python3", script_path], check=True)
-    print(f"Completed user_report.py.")
+    dispatch.run_script(script_path)
 
 if __name__ == "__main__":
     run_script()
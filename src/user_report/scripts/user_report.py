@@ -2,9 +2,8 @@ from datetime import datetime
 import os
 import pandas as pd
 from sqlalchemy import text
-from utilities import connections
-from gspread_dataframe import set_with_dataframe
-from gspread_formatting import cellFormat, textFormat, format_cell_range, set_column_widths
+from utilities import connections, sheets
+from gspread_formatting import cellFormat, textFormat
 import shutil
 
 sql_file_path = os.path.join(os.path.dirname(__file__), '../../../assets/user_report/user_report.sql')
@@ -40,14 +39,17 @@ client = connections.get_google_sheets_client()
 spreadsheet_name = 'User Reports'
 spreadsheet = client.open(spreadsheet_name)
 current_date = datetime.now().strftime('%Y-%m-%d')
-worksheet = spreadsheet.add_worksheet(title=current_date, rows="100", cols="20")
+# Sized for the data and for the formatted A1:Z1000 range, so no resize calls are needed.
+writer = sheets.SheetWriter.add_worksheet(spreadsheet, current_date,
+                                          rows=max(len(df) + 1, len(industry_counts) + 2, 1000),
+                                          cols=max(len(df.columns) + 1 + len(industry_counts.columns), 26), index=1)
 
-set_with_dataframe(worksheet, df)
-set_with_dataframe(worksheet, industry_counts, row=2, col=len(df.columns) + 2)
+writer.set_dataframe(df)
+writer.set_dataframe(industry_counts, row=2, col=len(df.columns) + 2)
 
-format_cell_range(worksheet, 'A1:Z1000', cellFormat(textFormat=textFormat(fontSize=12)))
-format_cell_range(worksheet, 'A1:F1', cellFormat(textFormat=textFormat(bold=True, fontSize=12)))
-set_column_widths(worksheet, [
+writer.format_range('A1:Z1000', cellFormat(textFormat=textFormat(fontSize=12)))
+writer.format_range('A1:F1', cellFormat(textFormat=textFormat(bold=True, fontSize=12)))
+writer.set_column_widths([
     ('A', 300),
     ('B', 300),
     ('C', 300),
@@ -55,21 +57,8 @@ set_column_widths(worksheet, [
     ('E', 200),
     ('F', 200)
 ])
-format_cell_range(worksheet, 'D1:F1000', cellFormat(horizontalAlignment='CENTER'))
-
-spreadsheet.batch_update({
-    'requests': [
-        {
-            'updateSheetProperties': {
-                'properties': {
-                    'sheetId': worksheet.id,
-                    'index': 1
-                },
-                'fields': 'index'
-            }
-        }
-    ]
-})
+writer.format_range('D1:F1000', cellFormat(horizontalAlignment='CENTER'))
+writer.flush()
 
 current_date_folder = datetime.now().strftime('%Y_%m_%d')
 script_name = 'user_report'
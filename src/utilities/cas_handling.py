@@ -1,53 +1,306 @@
+import json
 import re
+from collections import namedtuple
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# CAS numbers have at most 10 digits: up to 7, then 2, then the check digit.
+CAS_MAX_DIGITS = 10
+
+# Checksum weights of the zero-padded digits preceding the check digit (the digit next to it weighs 1).
+CAS_CHECKSUM_WEIGHTS = np.arange(CAS_MAX_DIGITS - 1, 0, -1)
+
+CAS_CANONICAL_PATTERN = r'^[1-9][0-9]{0,6}-[0-9]{2}-[0-9]$'
+
+def _arrow_strings(values):
+    """
+    Flat Arrow string array of the values; missing values read 'nan' and other non-strings are passed
+    through str(). Arrow-backed Series (large strings, possibly in several chunks) are combined into one array.
+    """
+    try:
+        strings = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        strings = pa.array(pd.Series(values, dtype=object).astype(str), type=pa.string(), from_pandas=True)
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    return pc.fill_null(strings.cast(pa.string()), 'nan')
+
+def cas_checksum_valid(digits):
+    """
+    Vectorized checksum test over digit strings (no hyphens). Values that are not 1 to
+    CAS_MAX_DIGITS ASCII digits are not valid.
+
+    :param digits: pyarrow string array, Series or list of digit strings
+    :return: boolean numpy array
+    """
+    if not isinstance(digits, pa.Array):
+        digits = _arrow_strings(digits)
+    if len(digits) == 0:
+        return np.zeros(0, dtype=bool)
+    well_formed = pc.fill_null(pc.match_substring_regex(digits, f'^[0-9]{{1,{CAS_MAX_DIGITS}}}$'), False)
+    padded = pc.utf8_lpad(pc.if_else(well_formed, digits, '0'), width=CAS_MAX_DIGITS, padding='0')
+    # Every value is now exactly CAS_MAX_DIGITS bytes, read from its own offset in the data buffer.
+    _, offsets, data = padded.buffers()
+    offset_type = np.int64 if pa.types.is_large_string(padded.type) else np.int32
+    starts = np.frombuffer(offsets, dtype=offset_type)[padded.offset:padded.offset + len(padded)]
+    data = np.frombuffer(data, dtype=np.uint8)
+    matrix = data[starts[:, None] + np.arange(CAS_MAX_DIGITS)].astype(np.int64) - ord('0')
+    valid = matrix[:, :-1] @ CAS_CHECKSUM_WEIGHTS % 10 == matrix[:, -1]
+    return valid & well_formed.to_numpy(zero_copy_only=False)
+
+def _verify(strings):
+    digits = pc.replace_substring(pc.utf8_trim_whitespace(strings), '-', '')
+    well_formed = pc.match_substring_regex(digits, f'^[1-9][0-9]{{0,{CAS_MAX_DIGITS - 1}}}$').to_numpy(zero_copy_only=False)
+    valid = np.zeros(len(strings), dtype=bool)
+    valid[well_formed] = cas_checksum_valid(pc.filter(digits, well_formed))
+    return valid
+
+def _correct(strings):
+    """
+    Corrected strings, and the boolean mask of the values that were not already in canonical form
+    (values in canonical form are left as they are; only the rest go through the corrections).
+    """
+    needs_correction = pc.invert(pc.match_substring_regex(strings, CAS_CANONICAL_PATTERN))
+    if not pc.any(needs_correction).as_py():
+        return strings, needs_correction
+    corrected = pc.replace_with_mask(strings, needs_correction, _correct_all(pc.filter(strings, needs_correction)))
+    return corrected, needs_correction
+
+def _correct_all(strings):
+    strings = pc.replace_substring(pc.utf8_trim_whitespace(strings), ' 00:00:00', '')
+    strings = pc.replace_substring_regex(strings, r'\s*-\s*', '-')
+
+    parts = pc.extract_regex(strings, r'^(?P<first>\d+)-(?P<middle>\d+)-(?P<last>\d+)$')
+    first = pc.utf8_ltrim(parts.field('first'), '0')
+    middle = pc.utf8_lpad(pc.utf8_ltrim(parts.field('middle'), '0'), width=2, padding='0')
+    last = pc.utf8_ltrim(parts.field('last'), '0')
+    last = pc.if_else(pc.equal(last, ''), '0', last)
+    strings = pc.if_else(pc.is_valid(parts), pc.binary_join_element_wise(first, middle, last, '-'), strings)
+
+    stripped = pc.utf8_ltrim(strings, '0')
+    lengths = pc.utf8_length(stripped)
+    plain = pc.and_(pc.match_substring_regex(strings, r'^\d+$'),
+                    pc.and_(pc.greater_equal(lengths, 5), pc.less_equal(lengths, CAS_MAX_DIGITS)))
+    hyphenated = pc.binary_join_element_wise(
+        pc.utf8_slice_codeunits(stripped, 0, -3), pc.utf8_slice_codeunits(stripped, -3, -1),
+        pc.utf8_slice_codeunits(stripped, -1), '-')
+    return pc.if_else(plain, hyphenated, strings)
+
+def verify_cas_series(cas):
+    """
+    Vectorized CAS validation: after removing hyphens and surrounding whitespace, the value must be
+    1 to 10 digits without a leading zero and pass the checksum.
+
+    :return: boolean Series aligned with cas
+    """
+    return pd.Series(_verify(_arrow_strings(cas)), index=cas.index)
+
+def correct_cas_series(cas):
+    """
+    Vectorized correction of common CAS formatting errors: surrounding whitespace, whitespace around
+    hyphens, date formatting (' 00:00:00'), leading zeros in any part, a one-digit middle part, and
+    unhyphenated digit strings, which are hyphenated in the canonical positions.
+    """
+    return pd.Series(_correct(_arrow_strings(cas))[0].to_numpy(zero_copy_only=False), index=cas.index, dtype=object)
+
+def analyze_cas_series(cas):
+    """
+    Validation and correction of a column of CAS numbers in one pass; each distinct value is
+    processed once.
+
+    Returns a DataFrame aligned with cas with the columns 'Valid Original', 'Corrected CAS',
+    'Valid Corrected', 'Final Valid' and 'Final CAS' (CAS columns as Arrow-backed strings).
+    The final CAS is the original (without surrounding whitespace) when valid, otherwise the valid corrected CAS, 'no_cas' for
+    missing values, or 'invalid_cas'.
+    """
+    encoded = _arrow_strings(cas).dictionary_encode()
+    strings, codes = encoded.dictionary, encoded.indices
+
+    valid_original = _verify(strings)
+    corrected, changed = _correct(strings)
+    valid_corrected = valid_original.copy()
+    changed = changed.to_numpy(zero_copy_only=False)
+    valid_corrected[changed] = _verify(pc.filter(corrected, changed))
+    valid_original, valid_corrected = pa.array(valid_original), pa.array(valid_corrected)
+    missing = pc.is_in(pc.utf8_lower(pc.utf8_trim_whitespace(strings)), value_set=pa.array(['', 'nan', 'none', '<na>']))
+    final = pc.if_else(valid_original, pc.utf8_trim_whitespace(strings), pc.if_else(valid_corrected, corrected,
+                       pc.if_else(missing, 'no_cas', 'invalid_cas')))
+
+    def column(values):
+        values = pc.take(values, codes)
+        if pa.types.is_boolean(values.type):
+            return values.to_numpy(zero_copy_only=False)
+        return pd.arrays.ArrowStringArray(values)
+
+    return pd.DataFrame({
+        'Valid Original': column(valid_original),
+        'Corrected CAS': column(corrected),
+        'Valid Corrected': column(valid_corrected),
+        'Final Valid': column(pc.or_(valid_original, valid_corrected)),
+        'Final CAS': column(final)
+    }, index=cas.index)
 
 def verify_cas(cas):
     """
     Verifies the correctness of CAS numbers using checksum validation.
     """
-    cas = str(cas).replace('-', '').strip()
-    if not cas.isdigit():
-        return False
-    reverse_cas = cas[::-1]
-    checksum = int(reverse_cas[0])
-    rest = reverse_cas[1:]
-    expected_checksum = sum(int(digit) * (index + 1) for index, digit in enumerate(rest)) % 10
-    return checksum == expected_checksum
+    return bool(verify_cas_series(pd.Series([cas], dtype=object)).iloc[0])
 
 def correct_cas(cas):
     """
     Corrects common formatting errors in CAS numbers, including leading zeros, date formatting, and whitespace.
     """
-    cas = re.sub(r'\s*-\s*', '-', str(cas).strip())
-    cas = cas.replace(' 00:00:00', '')
-    parts = cas.split('-')
-    if len(parts) == 3:
-        parts = [part.lstrip('0') for part in parts]
-        cas = '-'.join(parts)
-    return cas
+    return correct_cas_series(pd.Series([cas], dtype=object)).iloc[0]
 
 def finalize_cas(row, cas_column='cas'):
     """
     Determines the final CAS number based on validation and correction steps.
     """
-    original = row[cas_column]
-    corrected = correct_cas(original)
-    if verify_cas(original):
-        return original
-    elif verify_cas(corrected):
-        return corrected
-    return 'invalid_cas'
+    return analyze_cas_series(pd.Series([row[cas_column]], dtype=object))['Final CAS'].iloc[0]
 
 def process_cas_dataframe(df, cas_column='cas'):
     """
     Applies CAS verification and correction across a DataFrame and adds a final CAS column.
     """
-    df['Corrected CAS'] = df[cas_column].apply(correct_cas)
-    df['Valid Original'] = df[cas_column].apply(verify_cas)
-    df['Valid Corrected'] = df['Corrected CAS'].apply(verify_cas)
-    df['Final CAS'] = df.apply(finalize_cas, axis=1, cas_column=cas_column)
+    analysis = analyze_cas_series(df[cas_column])
+    for col in ['Corrected CAS', 'Valid Original', 'Valid Corrected', 'Final CAS']:
+        df[col] = analysis[col]
     return df
 
+def format_cas(digits):
+    """
+    Hyphenates a string of CAS digits into the canonical form, e.g. '50000' -> '50-00-0'.
+    """
+    return f"{digits[:-3]}-{digits[-3:-1]}-{digits[-1]}"
+
+def cas_typo_candidates(cas):
+    """
+    Checksum-valid CAS numbers one typo away from cas: every single-digit substitution and every
+    transposition of adjacent digits. Hyphens are ignored and re-inserted in the canonical positions.
+    """
+    digits = re.sub(r'\D', '', str(cas).replace(' 00:00:00', '')).lstrip('0')
+    if not 5 <= len(digits) <= 10:
+        return []
+
+    variants = set()
+    for i, digit in enumerate(digits):
+        variants.update(digits[:i] + other + digits[i + 1:] for other in '0123456789' if other != digit)
+    for i in range(len(digits) - 1):
+        if digits[i] != digits[i + 1]:
+            variants.add(digits[:i] + digits[i + 1] + digits[i] + digits[i + 2:])
+
+    variants = pa.array([variant for variant in variants if not variant.startswith('0')], type=pa.string())
+    return sorted(format_cas(variant) for variant in pc.filter(variants, cas_checksum_valid(variants)).to_pylist())
+
+def _additional_casrns(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    if not isinstance(value, list):
+        return []
+    return [item['additional_casrn'] for item in value if isinstance(item, dict) and item.get('additional_casrn')]
+
+def build_cas_index(profiles=None, pharos=None):
+    """
+    Set of known CAS numbers for typo resolution: profile cas_rn and additional CASRNs, and Pharos casrn.
+
+    :param profiles: profiles table (e.g. from utilities.snapshots.load_profiles)
+    :param pharos: Pharos data (e.g. from utilities.snapshots.load_pharos)
+    :rtype: set
+    """
+    known = set()
+    if profiles is not None:
+        known.update(profiles['cas_rn'].dropna().astype(str).str.strip())
+        for casrns in profiles['additional_casrns'].dropna().map(_additional_casrns):
+            known.update(str(casrn).strip() for casrn in casrns)
+    if pharos is not None:
+        known.update(pharos['casrn'].dropna().astype(str).str.strip())
+    known.discard('')
+    return known
+
+def resolve_cas_typo(cas, known_cas):
+    """
+    Known CAS numbers one typo away from cas (see cas_typo_candidates).
+
+    :param known_cas: set of known CAS numbers, from build_cas_index
+    :return: sorted list of candidates; a single candidate is an unambiguous correction
+    """
+    return [candidate for candidate in cas_typo_candidates(cas) if candidate in known_cas]
+
+CasKeySet = namedtuple('CasKeySet', ['keys', 'fallback'])
+CasKeySet.__doc__ = """
+Set of CAS numbers for membership tests: sorted int64 keys of the valid CAS numbers, and the
+stripped strings of entries that fail validation (matched verbatim, as before integer keys).
+"""
+
+def cas_key_series(cas):
+    """
+    Compact integer keys for a column of CAS numbers: the checksum-validated digits as int64
+    (hyphens and surrounding whitespace ignored, e.g. '7732-18-5' -> 7732185), <NA> when invalid.
+
+    :return: nullable Int64 Series aligned with cas
+    """
+    strings = _arrow_strings(cas)
+    valid = _verify(strings)
+    digits = pc.replace_substring(pc.utf8_trim_whitespace(pc.filter(strings, valid)), '-', '')
+    values = np.zeros(len(strings), dtype=np.int64)
+    values[valid] = pc.cast(digits, pa.int64()).to_numpy()
+    return pd.Series(pd.arrays.IntegerArray(values, ~valid), index=cas.index)
+
+def cas_key(cas):
+    """Integer key of a single CAS number (see cas_key_series), or None when it is invalid."""
+    key = cas_key_series(pd.Series([cas], dtype=object)).iloc[0]
+    return None if pd.isna(key) else int(key)
+
+def int_to_cas(keys):
+    """
+    Canonical CAS strings ('7732-18-5') for a Series of integer keys; missing keys stay missing.
+    """
+    digits = keys.astype('string[pyarrow]')
+    return digits.str[:-3] + '-' + digits.str[-3:-1] + '-' + digits.str[-1]
+
+def cas_key_set(cas):
+    """
+    CasKeySet of an iterable of CAS numbers, for cas_isin; missing values are skipped.
+    """
+    cas = pd.Series(list(cas), dtype=object).dropna()
+    keys = cas_key_series(cas)
+    fallback = set(cas[keys.isna().to_numpy()].astype(str).str.strip())
+    fallback.discard('')
+    return CasKeySet(np.unique(keys.dropna().to_numpy(dtype=np.int64)), fallback)
+
+def cas_isin(cas, key_set, keys=None):
+    """
+    Boolean mask of the CAS numbers in cas found in key_set (a CasKeySet): valid CAS numbers are
+    compared as integers, invalid ones by their stripped string against the fallback strings.
+
+    :param keys: cas_key_series(cas), when already computed (e.g. to test one column against many sets)
+    """
+    if keys is None:
+        keys = cas_key_series(cas)
+    valid = keys.notna().to_numpy()
+    found = np.zeros(len(cas), dtype=bool)
+    found[valid] = np.isin(keys[valid].to_numpy(dtype=np.int64), key_set.keys, assume_unique=False)
+    if key_set.fallback:
+        invalid = ~valid & cas.notna().to_numpy()
+        found[invalid] = cas[invalid].astype(str).str.strip().isin(key_set.fallback).to_numpy()
+    return pd.Series(found, index=cas.index)
+
+def merge_on_cas(left, right, left_on, right_on, how='left', **kwargs):
+    """
+    pd.merge on the integer keys of two CAS columns instead of their strings. Invalid or missing
+    CAS numbers never match (unlike NaN keys in pd.merge); the CAS columns themselves are kept.
+    """
+    left_keys = cas_key_series(left[left_on]).to_numpy(dtype=np.int64, na_value=-1)
+    right_keys = cas_key_series(right[right_on]).to_numpy(dtype=np.int64, na_value=-2)
+    merged = pd.merge(left.assign(_cas_key=left_keys), right.assign(_cas_key=right_keys),
+                      how=how, on='_cas_key', **kwargs)
+    return merged.drop(columns='_cas_key')
+
 def clean_cas_column(df, cas_column='cas'):
     """
     Cleans the CAS number column by removing invalid characters and validating the format.
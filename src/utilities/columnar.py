@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import sys
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+JSON_COLUMNS_KEY = b'cfkit_json_columns'
+OBJECT_COLUMNS_KEY = b'cfkit_object_columns'
+
+# Tags of the date and time values in JSON-serialized columns.
+DATETIME_TAG = '__datetime__'
+DATE_TAG = '__date__'
+
+def _is_nested(value):
+    return isinstance(value, (dict, list))
+
+def _is_missing(value):
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and math.isnan(value))
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return {DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {DATE_TAG: value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _from_json(value):
+    if DATETIME_TAG in value and len(value) == 1:
+        return pd.Timestamp(value[DATETIME_TAG])
+    if DATE_TAG in value and len(value) == 1:
+        return date.fromisoformat(value[DATE_TAG])
+    return value
+
+def _storable(df):
+    """
+    Copy of df that Parquet can hold without changing any value.
+
+    Object columns holding dicts/lists (JSON from Postgres) or values of more than one type (e.g.
+    Pharos casrn as str and int) are serialized value by value to JSON text, which keeps each value's
+    type. Other object columns are stored as their Arrow type and restored as object columns.
+    Raises TypeError for a column whose values cannot be stored either way.
+    Returns (frame, names of the JSON-serialized columns, names of the object columns).
+    """
+    df = df.copy()
+    json_columns, object_columns = [], []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        object_columns.append(col)
+        values = df[col][~df[col].map(_is_missing)]
+        if values.map(_is_nested).any() or values.map(type).nunique() > 1:
+            try:
+                df[col] = df[col].map(lambda x: None if _is_missing(x) else json.dumps(x, default=_to_json))
+            except (TypeError, ValueError) as error:
+                raise TypeError(f"Column {col!r} cannot be stored: {error}") from error
+            json_columns.append(col)
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as error:
+            raise TypeError(f"Column {col!r} cannot be stored: {error}") from error
+    return df, json_columns, object_columns
+
+def write_frame(df, path, compression='zstd'):
+    """
+    Write a DataFrame to a compressed Parquet file, atomically.
+    Column dtypes and values (e.g. CAS numbers, mixed-type object columns) are preserved exactly.
+    """
+    df, json_columns, object_columns = _storable(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[JSON_COLUMNS_KEY] = json.dumps(json_columns).encode()
+    metadata[OBJECT_COLUMNS_KEY] = json.dumps(object_columns).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression=compression)
+    os.replace(tmp_path, path)
+
+def read_frame(path, columns=None):
+    """
+    Read a DataFrame written by write_frame, restoring JSON-serialized columns value by value
+    and object columns (e.g. integers with missing values) as object columns.
+    """
+    table = pq.read_table(path, columns=columns)
+    metadata = table.schema.metadata or {}
+    json_columns = json.loads(metadata.get(JSON_COLUMNS_KEY, b'[]'))
+    object_columns = json.loads(metadata.get(OBJECT_COLUMNS_KEY, b'[]'))
+    df = table.to_pandas()
+    for col in json_columns:
+        if col in df.columns:
+            df[col] = pd.Series([json.loads(x, object_hook=_from_json) if isinstance(x, str) else x for x in df[col]],
+                                index=df.index, dtype=object)
+    for col in object_columns:
+        if col in df.columns and col not in json_columns and df[col].dtype != object:
+            df[col] = pd.Series(table.column(col).to_pylist(), index=df.index, dtype=object)
+    return df
+
+def export_xlsx(path, xlsx_path=None):
+    """
+    Write a Parquet file produced by write_frame (e.g. a pipeline checkpoint) to .xlsx for review.
+    Text such as CAS numbers is written as text. Returns the path of the workbook.
+    """
+    xlsx_path = xlsx_path or f"{os.path.splitext(path)[0]}.xlsx"
+    read_frame(path).to_excel(xlsx_path, index=False)
+    return xlsx_path
+
+if __name__ == "__main__":
+    # python -m utilities.columnar FILE.parquet [...]: write an .xlsx copy next to each file.
+    for parquet_path in sys.argv[1:]:
+        print(f"Wrote {export_xlsx(parquet_path)}")
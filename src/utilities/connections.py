@@ -1,40 +1,142 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import io
 import json
 import os
-import sqlalchemy
+import shutil
+import threading
 import pandas as pd
-from sqlalchemy.engine.base import Engine
-from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator
+
+# SQLAlchemy, gspread, oauth2client, tenacity and pyarrow are imported on first use so that tools
+# which never touch the database, Google Sheets or the query cache do not pay for them at startup.
+if TYPE_CHECKING:
+    import gspread
+    from sqlalchemy.engine.base import Engine
+
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), '../../assets/config.json')
 
+@lru_cache(maxsize=None)
 def load_config():
-    config_file_path = os.path.join(os.path.dirname(__file__), '../../assets/config.json')
-    with open(config_file_path, 'r') as config_file:
+    """Contents of assets/config.json, read once on first use."""
+    with open(CONFIG_FILE, 'r') as config_file:
         return json.load(config_file)
 
-config = load_config()
+def __getattr__(name):
+    # Module attribute `config`, kept for callers of the former import-time config.
+    if name == 'config':
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _LazyConfig(type):
+    """Resolves the Config settings from assets/config.json when they are first read."""
+
+    @property
+    def DB_PROD(cls):
+        return load_config()['database']['prod']
+
+    @property
+    def DB_STG(cls):
+        return load_config()['database']['stg']
+
+    @property
+    def GOOGLE_CLOUD_KEY(cls):
+        return os.path.join(os.path.dirname(__file__), '../../assets', load_config()['google']['json_keyfile'])
+
+class Config(metaclass=_LazyConfig):
+    pass
+
+# Connection pool of the database engines: connections are checked with a ping before use
+# and recycled before server-side idle timeouts can drop them.
+POOL_OPTIONS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True
+}
+
+# Query results cached on disk by run_cached_query(_stream), and how long they stay fresh.
+QUERY_CACHE_DIR = os.path.join(os.path.dirname(__file__), '../../data/cache/queries')
+QUERY_CACHE_TTL = timedelta(hours=4)
 
-class Config:
-    DB_PROD = config['database']['prod']
-    DB_STG = config['database']['stg']
-    GOOGLE_CLOUD_KEY = os.path.join(os.path.dirname(__file__), '../../assets', config['google']['json_keyfile'])
+# Set to 1 to bypass the query cache for a run without changing any script.
+QUERY_CACHE_BYPASS_ENV = 'CFKIT_QUERY_CACHE_BYPASS'
 
-def get_db_engine(environment='prod'):
+# Postgres type OIDs converted by run_query(method='copy'); other types are returned as text.
+COPY_BOOLEAN_TYPE = 16
+COPY_INTEGER_TYPES = {20, 21, 23}
+COPY_FLOAT_TYPES = {700, 701, 1700}
+COPY_JSON_TYPES = {114, 3802}
+COPY_DATE_TYPE = 1082
+COPY_TIMESTAMP_TYPE = 1114
+COPY_TIMESTAMPTZ_TYPE = 1184
+
+# Attempts per partition of run_query_partitioned before the whole fetch fails.
+PARTITION_ATTEMPTS = 3
+
+# Default number of rows per DataFrame yielded by run_query_stream.
+QUERY_CHUNKSIZE = 10_000
+
+# Shared engines per environment, reused by every caller in the process.
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _create_engine(environment):
+    import sqlalchemy
+
+    db_config = Config.DB_PROD if environment == 'prod' else Config.DB_STG
+    connection_string = f"{db_config['type']}://{db_config['user']}:" \
+                        f"{db_config['password']}@{db_config['host']}/{db_config['name']}"
+    return sqlalchemy.create_engine(connection_string, **POOL_OPTIONS)
+
+def get_db_engine(environment='prod', shared=True):
     """
-    Create a SQLAlchemy engine based on the specified environment.
-    
+    SQLAlchemy engine for the specified environment.
+
+    By default the engine is shared: every call in the process (e.g. all report stages run in
+    one process) gets the same pooled engine, so connections are set up once per run.
+
     :param environment: Target database environment ('prod' or 'stg').
+    :param shared: False for a private engine with its own pool.
     :return: SQLAlchemy engine.
     """
-    db_config = Config.DB_PROD if environment == 'prod' else Config.DB_STG
-    connection_string = f"{db_config['type']}://{db_config['user']}:" \
-                        f"{db_config['password']}@{db_config['host']}/{db_config['name']}"
-    return sqlalchemy.create_engine(connection_string)
+    if not shared:
+        return _create_engine(environment)
+    with _engines_lock:
+        if environment not in _engines:
+            _engines[environment] = _create_engine(environment)
+        return _engines[environment]
+
+def dispose_engines():
+    """Close the pooled connections of all shared engines; they reconnect on next use."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+def _forget_engines_in_child():
+    # Pooled connections must not be shared with forked worker processes.
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+atexit.register(dispose_engines)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_engines_in_child)
 
 @contextmanager
 def db_session(engine: Engine):
     """Provide a transactional scope around a series of operations."""
+    from sqlalchemy.exc import SQLAlchemyError
+
     connection = engine.connect()
     transaction = connection.begin()
     try:
@@ -46,16 +148,236 @@ def db_session(engine: Engine):
     finally:
         connection.close()
 
-def run_query(engine: Engine, query: str) -> pd.DataFrame:
+def _from_copy_text(values: pd.Series, type_code: int) -> pd.Series:
+    """
+    Convert a column of COPY CSV text to what read_sql returns for its type OID: int64, or float64
+    with NaN when there are NULLs; float64 for NUMERIC (read_sql coerces Decimal to float); bool, or
+    object with None when there are NULLs; parsed JSON; datetime.date objects for DATE; datetime64
+    for timestamps (in UTC with a time zone). A column of only NULLs stays object with None.
+    """
+    nulls = values.isna()
+    if nulls.all():
+        return values.astype(object).where(~nulls, None)
+    if type_code in COPY_INTEGER_TYPES:
+        return values.astype('float64' if nulls.any() else 'int64')
+    if type_code in COPY_FLOAT_TYPES:
+        return values.astype('float64')
+    if type_code == COPY_BOOLEAN_TYPE:
+        values = values.map({'t': True, 'f': False})
+        return values.astype(object).where(~nulls, None) if nulls.any() else values.astype(bool)
+    if type_code in COPY_JSON_TYPES:
+        return values.map(lambda value: json.loads(value) if isinstance(value, str) else None)
+    if type_code == COPY_DATE_TYPE:
+        return values.map(lambda value: date.fromisoformat(value) if isinstance(value, str) else None)
+    if type_code in (COPY_TIMESTAMP_TYPE, COPY_TIMESTAMPTZ_TYPE):
+        return pd.to_datetime(values, format='ISO8601', utc=type_code == COPY_TIMESTAMPTZ_TYPE)
+    return values.astype(object).where(~nulls, None)
+
+def _run_query_copy(engine: Engine, query: str, params=None) -> pd.DataFrame:
+    """
+    Execute a SQL query with COPY (query) TO STDOUT into an in-memory CSV buffer and parse it with
+    Arrow's CSV reader. Column types come from the result description of the query with LIMIT 0.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    with engine.connect() as connection:
+        with connection.connection.cursor() as cursor:
+            if params:
+                query = cursor.mogrify(query, params).decode()
+            cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+            columns = [(column.name, column.type_code) for column in cursor.description]
+            buffer = io.BytesIO()
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')", buffer)
+
+    buffer.seek(0)
+    names = [name for name, _ in columns]
+    table = pacsv.read_csv(
+        buffer,
+        read_options=pacsv.ReadOptions(column_names=names, skip_rows=1),
+        convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                             null_values=['\\N'], strings_can_be_null=True,
+                                             quoted_strings_can_be_null=False))
+    return pd.DataFrame({name: _from_copy_text(table.column(position).to_pandas(), type_code)
+                         for position, (name, type_code) in enumerate(columns)})
+
+def run_query(engine: Engine, query: str, params=None, method: str = 'read_sql') -> pd.DataFrame:
     """
     Execute a SQL query using the provided database engine and return the results as a DataFrame.
 
     :param engine: SQLAlchemy engine instance.
     :param query: SQL query string.
+    :param params: Optional driver-style bind parameters, e.g. {'since': ...} for %(since)s.
+    :param method: 'read_sql', or 'copy' for large extracts from Postgres: the result is exported
+                   with COPY ... TO STDOUT and parsed column-wise, which is several times faster for
+                   wide tables. Array and other non-scalar columns (except JSON) are returned as text.
     :return: DataFrame containing the query results.
     """
+    if method == 'copy':
+        return _run_query_copy(engine, query, params=params)
     with engine.connect() as connection:
-        return pd.read_sql(query, connection)
+        return pd.read_sql(query, connection, params=params)
+
+def run_query_stream(engine: Engine, query: str, chunksize: int = QUERY_CHUNKSIZE, params=None) -> Iterator[pd.DataFrame]:
+    """
+    Execute a SQL query on a server-side cursor and yield the results as DataFrames of at most
+    chunksize rows, so large result sets (e.g. JSON version documents) are never held in memory at once.
+
+    :param engine: SQLAlchemy engine instance.
+    :param query: SQL query string.
+    :param chunksize: Number of rows per DataFrame.
+    :param params: Optional driver-style bind parameters, e.g. {'since': ...} for %(since)s.
+    :return: Iterator of DataFrames (a single empty DataFrame for an empty result).
+    """
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+        yield from pd.read_sql(query, connection, params=params, chunksize=chunksize)
+
+def _is_transient(error: BaseException) -> bool:
+    # Lost or refused connections and server-side aborts; SQL and programming errors are not retried.
+    from sqlalchemy.exc import DBAPIError, OperationalError
+
+    return isinstance(error, OperationalError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
+
+def _fetch_partition(engine: Engine, query: str, params, method: str) -> pd.DataFrame:
+    from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+    retrying = Retrying(stop=stop_after_attempt(PARTITION_ATTEMPTS), wait=wait_exponential(multiplier=1, max=30),
+                        retry=retry_if_exception(_is_transient), reraise=True)
+    return retrying(run_query, engine, query, params=params, method=method)
+
+def run_query_partitioned(engine: Engine, table: str, columns='*', key: str = 'id', where: str = None,
+                          partitions: int = 8, max_workers: int = 4, params=None,
+                          method: str = 'read_sql') -> pd.DataFrame:
+    """
+    Read a large table as key-range partitions fetched concurrently on pooled connections.
+
+    The key range is read from the table (MIN/MAX on the key, answered from its index), split into
+    equal-width partitions, and each partition is a range scan of the table with its own cursor,
+    retried on its own when the connection fails. The partitions are reassembled in key order.
+
+    :param engine: SQLAlchemy engine instance.
+    :param table: Table to read, e.g. 'profiles'.
+    :param columns: Column list (SQL expressions allowed) or '*'.
+    :param key: Integer column to partition on, e.g. the primary key.
+    :param where: Optional row filter (SQL condition on the table). Literal percent signs must be
+                  written as %% since it is run with bind parameters.
+    :param partitions: Number of key ranges.
+    :param max_workers: Partitions fetched at the same time (at most the pool size is useful).
+    :param params: Optional driver-style bind parameters of where.
+    :param method: Fetch method of each partition, see run_query.
+    :return: DataFrame containing the rows, ordered by key.
+    """
+    params = dict(params or {})
+    select = columns if isinstance(columns, str) else ', '.join(columns)
+    condition = f" AND ({where})" if where else ""
+    bounds = run_query(engine, f"SELECT MIN({key}) AS lo, MAX({key}) AS hi FROM {table} WHERE TRUE{condition}",
+                       params=params)
+    lo, hi = bounds['lo'].iloc[0], bounds['hi'].iloc[0]
+    if pd.isna(lo):
+        return run_query(engine, f"SELECT {select} FROM {table} WHERE FALSE", params=params)
+
+    lo, hi = int(lo), int(hi) + 1
+    edges = sorted({lo + (hi - lo) * i // partitions for i in range(partitions)} | {hi})
+    partition_query = (f"SELECT {select} FROM {table} "
+                       f"WHERE {key} >= %(_partition_lo)s AND {key} < %(_partition_hi)s{condition} ORDER BY {key}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_fetch_partition, engine, partition_query,
+                            dict(params, _partition_lo=start, _partition_hi=end), method)
+            for start, end in zip(edges[:-1], edges[1:])
+        ]
+        frames = [future.result() for future in futures]
+
+    return pd.concat(frames, ignore_index=True)
+
+def query_cache_key(environment: str, query: str, params=None) -> str:
+    """Cache key of a query result: hash of the environment, the SQL text and the bind parameters."""
+    payload = json.dumps({'environment': environment, 'query': query, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _cache_bypassed(refresh: bool) -> bool:
+    return refresh or os.environ.get(QUERY_CACHE_BYPASS_ENV, '').lower() in ('1', 'true', 'yes')
+
+def _cached_parts(entry_dir: str, ttl: timedelta):
+    """Part files of a complete, unexpired cache entry, or None."""
+    try:
+        with open(os.path.join(entry_dir, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if datetime.now() - datetime.fromisoformat(meta['cached_at']) > ttl:
+        return None
+    return [os.path.join(entry_dir, part) for part in meta['parts']]
+
+def _store_parts(entry_dir: str, frames: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Write frames as part files and yield each as read back from its file, so a fetched result is
+    identical to a cached one. The entry only becomes visible once complete; the partial files are
+    removed if the consumer stops early or the query fails.
+    """
+    from utilities import columnar
+
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        parts = []
+        for frame in frames:
+            part = f"part-{len(parts):05d}.parquet"
+            columnar.write_frame(frame, os.path.join(tmp_dir, part))
+            parts.append(part)
+            yield columnar.read_frame(os.path.join(tmp_dir, part))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as file:
+            json.dump({'cached_at': datetime.now().isoformat(timespec='seconds'), 'parts': parts}, file)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def run_cached_query_stream(environment: str, query: str, chunksize: int = QUERY_CHUNKSIZE, params=None,
+                            ttl: timedelta = QUERY_CACHE_TTL, refresh: bool = False,
+                            cache_dir: str = QUERY_CACHE_DIR) -> Iterator[pd.DataFrame]:
+    """
+    run_query_stream with a disk cache: within ttl of the last complete run, the chunks are read
+    back from compressed Parquet files without touching the database.
+
+    :param environment: Target database environment ('prod' or 'stg').
+    :param ttl: timedelta after which a cached result is fetched again.
+    :param refresh: Bypass the cache and fetch again (also set by the CFKIT_QUERY_CACHE_BYPASS environment variable).
+    """
+    from utilities import columnar
+
+    entry_dir = os.path.join(cache_dir, query_cache_key(environment, query, params))
+    parts = None if _cache_bypassed(refresh) else _cached_parts(entry_dir, ttl)
+    if parts is not None:
+        print(f"Using cached query result from {entry_dir}")
+        for part in parts:
+            yield columnar.read_frame(part)
+        return
+    yield from _store_parts(entry_dir, run_query_stream(get_db_engine(environment), query, chunksize=chunksize, params=params))
+
+def run_cached_query(environment: str, query: str, params=None, ttl: timedelta = QUERY_CACHE_TTL,
+                     refresh: bool = False, cache_dir: str = QUERY_CACHE_DIR) -> pd.DataFrame:
+    """
+    run_query with a disk cache keyed by environment, SQL text and parameters (see run_cached_query_stream).
+    An entry written by run_cached_query_stream for the same query is read back whole.
+
+    :return: DataFrame containing the query results.
+    """
+    from utilities import columnar
+
+    entry_dir = os.path.join(cache_dir, query_cache_key(environment, query, params))
+    parts = None if _cache_bypassed(refresh) else _cached_parts(entry_dir, ttl)
+    if parts is not None:
+        print(f"Using cached query result from {entry_dir}")
+        frames = [columnar.read_frame(part) for part in parts]
+    else:
+        result = run_query(get_db_engine(environment), query, params=params)
+        frames = list(_store_parts(entry_dir, iter([result])))
+    if not frames:
+        return pd.DataFrame()
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
 
 def get_google_sheets_client() -> gspread.Client:
     """
@@ -63,6 +385,9 @@ def get_google_sheets_client() -> gspread.Client:
 
     :return: gspread.Client object
     """
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
     scope = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
     creds = ServiceAccountCredentials.from_json_keyfile_name(Config.GOOGLE_CLOUD_KEY, scope)
     client = gspread.authorize(creds)
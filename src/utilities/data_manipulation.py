@@ -1,3 +1,5 @@
+import hashlib
+import numpy as np
 import pandas as pd
 
 def clear_false(df: pd.DataFrame) -> pd.DataFrame:
@@ -69,4 +71,26 @@ def apply_custom_order(df: pd.DataFrame, order: list, id_column: str) -> pd.Data
     df['Order'] = df[id_column].apply(lambda x: order.index(x) if x in order else max_order - x)
     df.sort_values('Order', inplace=True)
     df.drop('Order', axis=1, inplace=True)
-    return df
\ No newline at end of file
+    return df
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame's column names and values, used to detect changed reference data.
+    Object columns are hashed through their string form so list and dict values are supported.
+    """
+    hashable = df.astype({col: str for col in df.columns if df[col].dtype == object})
+    digest = hashlib.sha1(str(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(hashable, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def missing_as_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Text columns as plain object columns in which missing values (None, pd.NA) and empty strings are NaN,
+    the form pd.read_excel gives them. Other columns keep their dtype.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col].dtype):
+            values = df[col].astype(object)
+            df[col] = values.mask(values.isna() | values.eq(''), np.nan)
+    return df
@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from utilities import sqlite_store
+
+STORE_PATH = os.path.join(os.path.dirname(__file__), '../../data/cas_mapping/decisions/mapping_decisions.sqlite')
+
+# Suffix of the distance_lev marker written by the interactive review -> decision code.
+DECISION_SUFFIXES = {'-UY': 'y', '-UN': 'n', '-UR': 'r'}
+
+def decision_code(distance_lev):
+    """Decision code ('y', 'n' or 'r') from a reviewed distance_lev marker such as '0-UY', else None."""
+    for suffix, code in DECISION_SUFFIXES.items():
+        if str(distance_lev).endswith(suffix):
+            return code
+    return None
+
+class DecisionStore:
+    """
+    Persistent, versioned store of analyst mapping decisions (accept / reject / replace) per ingredient.
+
+    Decisions are only ever appended; the newest decision for an ingredient wins and older ones
+    remain as history. The row id is the decision version.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS decisions (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                ingredient TEXT NOT NULL,
+                decision TEXT NOT NULL,
+                record TEXT NOT NULL,
+                source TEXT NOT NULL,
+                decided_at TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS decisions_ingredient ON decisions (ingredient, version)")
+
+    def record(self, ingredient, match, source='interactive'):
+        """
+        Append the reviewed match for an ingredient. Matches without a review marker are ignored.
+
+        :return: True when a decision was stored
+        """
+        decision = decision_code(match.get('distance_lev'))
+        if decision is None:
+            return False
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO decisions (ingredient, decision, record, source, decided_at) VALUES (?, ?, ?, ?, ?)",
+                (ingredient, decision, sqlite_store.dump_record(match), source, datetime.now().isoformat(timespec='seconds')))
+        return True
+
+    def latest(self, ingredients):
+        """Newest (decision, match record) per ingredient, for the ingredients that have one."""
+        rows = sqlite_store.select_in(self.connection, """
+            SELECT ingredient, decision, record FROM decisions
+            WHERE version IN (
+                SELECT MAX(version) FROM decisions WHERE ingredient IN ({placeholders}) GROUP BY ingredient
+            )
+        """, ingredients)
+        return {ingredient: (decision, json.loads(record)) for ingredient, decision, record in rows}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,51 @@
+import importlib
+import os
+import runpy
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class ScriptError(RuntimeError):
+    """A report script exited with a non-zero status."""
+
+def _check_exit(name, code):
+    if code not in (None, 0):
+        raise ScriptError(f"{name} exited with status {code}")
+
+def run_script(script_path):
+    """
+    Run a report script in the current interpreter, as `python script_path` would.
+
+    Modules the script imports (pandas, utilities, shared DB engines, loaded snapshots) stay
+    loaded, so the next script run in the same session starts warm.
+    Raises ScriptError when the script calls sys.exit with a non-zero status.
+    """
+    name = os.path.basename(script_path)
+    script_dir = os.path.dirname(os.path.abspath(script_path))
+    argv = sys.argv
+    sys.argv = [script_path]
+    sys.path.insert(0, script_dir)
+    print(f"Running {name}...")
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+    except SystemExit as exit:
+        _check_exit(name, exit.code)
+    finally:
+        sys.argv = argv
+        sys.path.remove(script_dir)
+    print(f"Completed {name}.")
+
+def run_entry_point(module_name, function='main'):
+    """
+    Import a report script as a module and call its entry point function in the current interpreter.
+
+    Use this instead of run_script for scripts whose functions must be importable by name,
+    e.g. to be sent to worker processes.
+    """
+    name = f"{module_name}.{function}"
+    print(f"Running {name}...")
+    try:
+        getattr(importlib.import_module(module_name), function)()
+    except SystemExit as exit:
+        _check_exit(name, exit.code)
+    print(f"Completed {name}.")
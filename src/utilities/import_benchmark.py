@@ -0,0 +1,85 @@
+"""
+Import-time benchmark of the cfkit tools.
+
+Each tool script's top-level imports are read from its source and imported in a fresh interpreter,
+so the figures are the startup cost a tool pays before doing any work. Run from src/:
+
+    python -m utilities.import_benchmark [tool ...] [--repeat N] [--detail]
+
+--detail prints the slowest modules of each tool from python -X importtime.
+"""
+import argparse
+import ast
+import glob
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def tool_scripts(tools=None):
+    """tool name -> script paths under src/<tool>/scripts."""
+    scripts = {}
+    for path in sorted(glob.glob(os.path.join(SRC_DIR, '*', 'scripts', '*.py'))):
+        tool = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        if os.path.basename(path) != '__init__.py' and (not tools or tool in tools):
+            scripts.setdefault(tool, []).append(path)
+    return scripts
+
+def script_imports(path):
+    """Import statements at the top level of a script, as source lines."""
+    with open(path, 'r') as file:
+        tree = ast.parse(file.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def _run(code, env, *flags):
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=SRC_DIR, env=env,
+                          capture_output=True, text=True)
+
+def time_imports(imports, repeat=5):
+    """Median seconds to run the imports in a fresh interpreter, or None when they fail."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    code = ("import time\n_start = time.perf_counter()\n" + "\n".join(imports) +
+            "\nprint(time.perf_counter() - _start)")
+    timings = []
+    for _ in range(repeat):
+        result = _run(code, env)
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+def slowest_modules(imports, top=8):
+    """(cumulative microseconds, module) of the slowest imports, from python -X importtime."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = _run("\n".join(imports), env, '-X', 'importtime')
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        if not module.startswith('  '):
+            rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import-time startup cost of each cfkit tool.")
+    parser.add_argument('tools', nargs='*', help="Tool directories to measure (default: all).")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per script.")
+    parser.add_argument('--detail', action='store_true', help="Show the slowest modules per script.")
+    args = parser.parse_args()
+
+    print(f"{'script':<70} {'imports (s)':>11}")
+    for tool, paths in tool_scripts(args.tools).items():
+        for path in paths:
+            imports = script_imports(path)
+            seconds = time_imports(imports, repeat=args.repeat)
+            name = os.path.relpath(path, SRC_DIR)
+            print(f"{name:<70} {'failed' if seconds is None else f'{seconds:.3f}':>11}")
+            if args.detail and seconds is not None:
+                for cumulative, module in slowest_modules(imports):
+                    print(f"    {module:<66} {cumulative / 1e6:11.3f}")
+
+if __name__ == "__main__":
+    main()
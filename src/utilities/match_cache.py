@@ -0,0 +1,61 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import timedelta
+
+from utilities import sqlite_store
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), '../../data/cache/cas_mapping_matches.sqlite')
+
+# Cached matches older than this are dropped when the cache is opened, whatever their reference version.
+CACHE_MAX_AGE = timedelta(days=30)
+
+class MatchCache:
+    """
+    SQLite-backed cache of ingredient -> best match records, scoped to one reference-data version.
+
+    Lookups only see entries of the cache's reference version, so a changed profiles table or
+    cas_maps.xlsx misses the old entries. Entries of every version are kept until they are
+    max_age old, so runs against different reference data (or input shards) can share one file.
+    """
+
+    def __init__(self, reference_version, path=CACHE_PATH, max_age=CACHE_MAX_AGE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.reference_version = reference_version
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS matches (
+                reference_version TEXT NOT NULL,
+                ingredient TEXT NOT NULL,
+                record TEXT NOT NULL,
+                stored_at REAL,
+                PRIMARY KEY (reference_version, ingredient)
+            )
+        """)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(matches)")]
+        with self.connection:
+            if 'stored_at' not in columns:
+                self.connection.execute("ALTER TABLE matches ADD COLUMN stored_at REAL")
+            self.connection.execute("DELETE FROM matches WHERE stored_at IS NULL OR stored_at < ?",
+                                    (time.time() - max_age.total_seconds(),))
+
+    def get_many(self, ingredients):
+        """Cached records for the given ingredients; ingredients never matched are absent."""
+        rows = sqlite_store.select_in(self.connection,
+                         "SELECT ingredient, record FROM matches WHERE reference_version = ? AND ingredient IN ({placeholders})",
+                         ingredients, params=(self.reference_version,))
+        return {ingredient: json.loads(record) for ingredient, record in rows}
+
+    def put_many(self, matches):
+        """Store ingredient -> record pairs, committing immediately so an interrupted run can resume."""
+        stored_at = time.time()
+        rows = [(self.reference_version, ingredient, sqlite_store.dump_record(record), stored_at)
+                for ingredient, record in matches.items()]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO matches (reference_version, ingredient, record, stored_at) VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.connection.close()
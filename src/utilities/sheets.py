@@ -0,0 +1,304 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from numbers import Real
+
+import numpy as np
+import pandas as pd
+from gspread.exceptions import APIError
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from gspread_formatting import batch_update_requests
+from tqdm import tqdm
+
+# Default Sheets API write quota is 60 requests per minute per user; stay just under it.
+WRITE_REQUESTS_PER_MINUTE = 55
+QUOTA_WINDOW = 60.0
+
+MAX_ATTEMPTS = 6
+MAX_BACKOFF = 64
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Cells sent per values.batchUpdate call, keeping request bodies well under the API payload limit.
+MAX_CELLS_PER_REQUEST = 200_000
+
+# A spreadsheet may hold at most this many cells across all of its worksheets.
+MAX_SPREADSHEET_CELLS = 10_000_000
+
+# Block shape for parallel uploads of large frames.
+BLOCK_CELLS = 50_000
+BLOCK_COLUMNS = 100
+UPLOAD_WORKERS = 4
+
+class QuotaBudget:
+    """
+    Sliding-window budget of API requests per minute, shared by every writer in the process.
+    acquire() blocks until another request fits in the window.
+    """
+
+    def __init__(self, per_minute=WRITE_REQUESTS_PER_MINUTE, window=QUOTA_WINDOW):
+        self.per_minute = per_minute
+        self.window = window
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= self.window:
+                    self._sent.popleft()
+                if len(self._sent) < self.per_minute:
+                    self._sent.append(now)
+                    return
+                wait = self.window - (now - self._sent[0])
+            time.sleep(wait)
+
+write_budget = QuotaBudget()
+read_budget = QuotaBudget()
+
+def _retryable(error):
+    return getattr(error, 'code', None) in RETRY_STATUS_CODES
+
+def call_with_backoff(func, *args, budget=None, **kwargs):
+    """
+    Call a gspread API method within the write quota budget, retrying rate-limit (429) and
+    transient server errors with exponential backoff and jitter.
+    """
+    budget = budget or write_budget
+    for attempt in range(MAX_ATTEMPTS):
+        budget.acquire()
+        try:
+            return func(*args, **kwargs)
+        except APIError as error:
+            if not _retryable(error) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt, MAX_BACKOFF) + random.uniform(0, 1)
+            print(f"Sheets API returned {error.code}; retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def check_cell_budget(spreadsheet, rows, cols):
+    """
+    Raise ValueError when adding a rows x cols worksheet would take the spreadsheet past
+    MAX_SPREADSHEET_CELLS. Returns the number of cells still free afterwards.
+    """
+    metadata = call_with_backoff(spreadsheet.fetch_sheet_metadata, budget=read_budget)
+    used = sum(sheet['properties']['gridProperties'].get('rowCount', 0) *
+               sheet['properties']['gridProperties'].get('columnCount', 0)
+               for sheet in metadata.get('sheets', []))
+    free = MAX_SPREADSHEET_CELLS - used - rows * cols
+    if free < 0:
+        raise ValueError(f"Spreadsheet '{spreadsheet.title}' has {used:,} of {MAX_SPREADSHEET_CELLS:,} cells in use; "
+                         f"a {rows:,} x {cols:,} worksheet does not fit. Delete or trim old worksheets first.")
+    return free
+
+def cell_value(value, text=False):
+    """
+    Sheets representation of a DataFrame value, matching gspread_dataframe: missing values become
+    empty cells, finite numbers are sent as numbers and everything else (including infinities, which
+    JSON cannot carry) as text. With text, numbers are sent as text too, e.g. for TEXT-formatted columns.
+    """
+    if isinstance(value, np.generic) and not isinstance(value, np.bool_):
+        value = value.item()
+    if pd.isnull(value) is True:
+        return ""
+    if isinstance(value, Real) and not text and math.isfinite(value):
+        return value
+    value = str(value)
+    if value.startswith("'"):
+        return f"'{value}"
+    return value
+
+def dataframe_values(df, include_column_header=True, text_columns=()):
+    """
+    Rows of cell values for df, with the column names as the first row unless disabled.
+    Values of the text_columns (column names) are sent as text.
+    """
+    text = [column in set(text_columns) for column in df.columns]
+    rows = [[cell_value(value, is_text) for value, is_text in zip(row, text)]
+            for row in df.itertuples(index=False, name=None)]
+    if include_column_header:
+        rows.insert(0, [cell_value(column) for column in df.columns])
+    return rows
+
+class SheetWriter:
+    """
+    Collects writes to one worksheet and sends them in as few API calls as possible.
+
+    Structural changes, formatting, column widths, conditional formats and notes are queued as
+    batchUpdate requests; cell values are queued as ranges. flush() sends all requests in one
+    spreadsheet batchUpdate (growing the grid first when the values need it), then the values
+    in values.batchUpdate calls of up to MAX_CELLS_PER_REQUEST cells.
+    """
+
+    def __init__(self, worksheet, budget=None):
+        self.worksheet = worksheet
+        self.spreadsheet = worksheet.spreadsheet
+        self.budget = budget
+        self.requests = []
+        self.values = []
+        self.notes = {}
+        self.row_count = worksheet.row_count
+        self.col_count = worksheet.col_count
+        self._grid_changed = False
+
+    @classmethod
+    def add_worksheet(cls, spreadsheet, title, rows, cols, index=None, budget=None, check_budget=True):
+        """
+        Create a worksheet sized for its data and return a writer for it.
+        With check_budget, fail before creating anything if the spreadsheet has no room for it.
+        """
+        rows, cols = max(rows, 1), max(cols, 1)
+        if check_budget:
+            check_cell_budget(spreadsheet, rows, cols)
+        worksheet = call_with_backoff(spreadsheet.add_worksheet, title=title, rows=rows,
+                                      cols=cols, index=index, budget=budget)
+        return cls(worksheet, budget=budget)
+
+    @property
+    def sheet_id(self):
+        return self.worksheet.id
+
+    def request(self, *requests):
+        """Queue raw batchUpdate requests (dicts in the Sheets API format)."""
+        self.requests.extend(requests)
+
+    def _ensure_size(self, rows, cols):
+        if rows > self.row_count:
+            self.row_count = rows
+            self._grid_changed = True
+        if cols > self.col_count:
+            self.col_count = cols
+            self._grid_changed = True
+
+    def set_values(self, rows, row=1, col=1):
+        """Queue a block of values with its top-left cell at (row, col), 1-based."""
+        rows = [list(values) for values in rows]
+        if not rows:
+            return
+        width = max(len(values) for values in rows)
+        self._ensure_size(row + len(rows) - 1, col + width - 1)
+        self.values.append((row, col, rows))
+
+    def set_dataframe(self, df, row=1, col=1, include_column_header=True, text_columns=()):
+        """
+        Queue a DataFrame (header row first) with its top-left cell at (row, col), 1-based.
+        Values of the text_columns are sent as text (see dataframe_values).
+        """
+        self.set_values(dataframe_values(df, include_column_header, text_columns), row=row, col=col)
+
+    def upload_dataframe(self, df, row=1, col=1, include_column_header=True, block_cells=BLOCK_CELLS,
+                         block_columns=BLOCK_COLUMNS, max_workers=UPLOAD_WORKERS, progress=True, text_columns=()):
+        """
+        Upload a large DataFrame as row and column blocks sent concurrently, each retried on its own.
+
+        Queued requests and values are flushed first, so the grid is already sized (and text
+        formats applied) when the blocks arrive. Returns the number of blocks sent.
+        """
+        rows = dataframe_values(df, include_column_header, text_columns)
+        if not rows:
+            return 0
+        width = len(rows[0])
+        self._ensure_size(row + len(rows) - 1, col + width - 1)
+        self.flush()
+
+        block_width = max(min(block_columns, width), 1)
+        block_height = max(block_cells // block_width, 1)
+        blocks = [(row + top, col + left, [values[left:left + block_width] for values in rows[top:top + block_height]])
+                  for top in range(0, len(rows), block_height)
+                  for left in range(0, width, block_width)]
+
+        def send(block):
+            top, left, values = block
+            a1_range = f"{rowcol_to_a1(top, left)}:{rowcol_to_a1(top + len(values) - 1, left + len(values[0]) - 1)}"
+            call_with_backoff(self.spreadsheet.values_batch_update, {
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': absolute_range_name(self.worksheet.title, a1_range), 'values': values}]
+            }, budget=self.budget)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=len(rows) * width, unit='cells', desc=f"Uploading {self.worksheet.title}",
+                     disable=not progress) as bar:
+            futures = {executor.submit(send, block): block for block in blocks}
+            for future in as_completed(futures):
+                future.result()
+                _, _, values = futures[future]
+                bar.update(len(values) * len(values[0]))
+        return len(blocks)
+
+    def set_note(self, row, col, note):
+        """Queue a hover note on the cell at (row, col), 1-based."""
+        self.notes[(row, col)] = note
+
+    def format_range(self, a1_range, cell_format):
+        """Queue a gspread_formatting CellFormat for an A1 range."""
+        self.request(*batch_update_requests.format_cell_range(self.worksheet, a1_range, cell_format))
+
+    def set_column_widths(self, widths):
+        """Queue column widths from (A1 column range such as 'A' or 'B:D', pixels) pairs."""
+        self.request(*batch_update_requests.set_column_widths(self.worksheet, widths))
+
+    def add_conditional_format(self, rule, index=0):
+        """Queue a conditional format rule (Sheets API ConditionalFormatRule dict)."""
+        self.request({'addConditionalFormatRule': {'rule': rule, 'index': index}})
+
+    def _grid_request(self):
+        return {
+            'updateSheetProperties': {
+                'properties': {
+                    'sheetId': self.sheet_id,
+                    'gridProperties': {'rowCount': self.row_count, 'columnCount': self.col_count}
+                },
+                'fields': 'gridProperties.rowCount,gridProperties.columnCount'
+            }
+        }
+
+    def _note_requests(self):
+        return [{
+            'updateCells': {
+                'range': {
+                    'sheetId': self.sheet_id,
+                    'startRowIndex': row - 1,
+                    'endRowIndex': row,
+                    'startColumnIndex': col - 1,
+                    'endColumnIndex': col
+                },
+                'rows': [{'values': [{'note': note}]}],
+                'fields': 'note'
+            }
+        } for (row, col), note in self.notes.items()]
+
+    def _value_batches(self):
+        """values.batchUpdate bodies of at most MAX_CELLS_PER_REQUEST cells each."""
+        batch, cells = [], 0
+        for row, col, rows in self.values:
+            width = max(len(values) for values in rows)
+            step = max(MAX_CELLS_PER_REQUEST // width, 1)
+            for start in range(0, len(rows), step):
+                block = rows[start:start + step]
+                if batch and cells + len(block) * width > MAX_CELLS_PER_REQUEST:
+                    yield batch
+                    batch, cells = [], 0
+                a1_range = (f"{rowcol_to_a1(row + start, col)}:"
+                            f"{rowcol_to_a1(row + start + len(block) - 1, col + width - 1)}")
+                batch.append({'range': absolute_range_name(self.worksheet.title, a1_range), 'values': block})
+                cells += len(block) * width
+        if batch:
+            yield batch
+
+    def flush(self):
+        """Send everything queued so far. Returns the number of API calls made."""
+        requests = ([self._grid_request()] if self._grid_changed else []) + self.requests + self._note_requests()
+        calls = 0
+        if requests:
+            call_with_backoff(self.spreadsheet.batch_update, {'requests': requests}, budget=self.budget)
+            calls += 1
+        for batch in self._value_batches():
+            call_with_backoff(self.spreadsheet.values_batch_update,
+                              {'valueInputOption': 'USER_ENTERED', 'data': batch}, budget=self.budget)
+            calls += 1
+        self.requests, self.values, self.notes = [], [], {}
+        self._grid_changed = False
+        return calls
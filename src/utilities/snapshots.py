@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utilities import columnar, connections, data_manipulation
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), '../../data/cache/snapshots')
+PHAROS_FILE = os.path.join(os.path.dirname(__file__), '../../assets/pharos.xlsx')
+
+# Snapshots younger than this are served without contacting the database.
+MAX_AGE = timedelta(minutes=15)
+
+# Profile columns read by the consumers of the snapshot (cas_mapping, cas_handling.build_cas_index).
+PROFILE_COLUMNS = [
+    'id',
+    'name',
+    'cas_rn',
+    'inci',
+    'status',
+    'manual_rollup_score',
+    'manual_hazard_band_score',
+    'scil_status',
+    'tco_status',
+    'additional_casrns',
+    'list_based_c2c_score',
+    'list_based_hazard_score'
+]
+
+# Per-row content hash computed by the database, compared on refresh to find changed rows.
+ROW_HASH = f"md5(ROW({', '.join(PROFILE_COLUMNS)})::text) AS row_hash"
+
+# In-process copies of loaded snapshots: name -> (version, DataFrame).
+_loaded = {}
+
+def _snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.parquet")
+
+def _meta_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.json")
+
+def _read_meta(name):
+    try:
+        with open(_meta_path(name), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(name, meta):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = f"{_meta_path(name)}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(tmp_path, _meta_path(name))
+
+def _store(name, df, meta):
+    columnar.write_frame(df, _snapshot_path(name))
+    _write_meta(name, meta)
+    _loaded[name] = (meta['version'], df)
+
+def _load(name):
+    meta = _read_meta(name)
+    cached = _loaded.get(name)
+    if cached is not None and cached[0] == meta['version']:
+        return cached[1]
+    df = columnar.read_frame(_snapshot_path(name))
+    _loaded[name] = (meta['version'], df)
+    return df
+
+def snapshot_version(name):
+    """
+    Version string of a stored snapshot (e.g. 'profiles_prod' or 'pharos'), or None if it does not exist.
+    The version changes whenever the snapshot's content changes.
+    """
+    meta = _read_meta(name)
+    return meta['version'] if meta else None
+
+def _profiles_version(profiles):
+    return data_manipulation.dataframe_fingerprint(profiles[['id', 'row_hash']])
+
+def _full_refresh_profiles(name, engine):
+    print("Downloading full profiles snapshot...")
+    profiles = connections.run_query_partitioned(engine, 'profiles', columns=PROFILE_COLUMNS + [ROW_HASH], key='id',
+                                                 method='copy')
+    _store(name, profiles, {
+        'version': _profiles_version(profiles),
+        'columns': PROFILE_COLUMNS,
+        'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(profiles)
+    })
+
+def _incremental_refresh_profiles(name, engine, meta):
+    if meta.get('columns') != PROFILE_COLUMNS:
+        return _full_refresh_profiles(name, engine)
+
+    snapshot = _load(name)
+    current = connections.run_query(engine, f"SELECT id, {ROW_HASH} FROM profiles", method='copy')
+    stored = snapshot[['id', 'row_hash']].merge(current, how='outer', on=['id', 'row_hash'], indicator=True)
+    changed_ids = stored.loc[stored['_merge'] == 'right_only', 'id'].astype(int).tolist()
+    kept = snapshot[snapshot['id'].isin(current['id']) & ~snapshot['id'].isin(changed_ids)]
+    meta = dict(meta, refreshed_at=datetime.now().isoformat(timespec='seconds'))
+    if len(kept) == len(snapshot) and not changed_ids:
+        _write_meta(name, meta)
+        return
+
+    frames = [kept]
+    if changed_ids:
+        frames.append(connections.run_query(
+            engine, f"SELECT {', '.join(PROFILE_COLUMNS)}, {ROW_HASH} FROM profiles WHERE id = ANY(%(ids)s)",
+            params={'ids': changed_ids}))
+    profiles = pd.concat(frames, ignore_index=True).sort_values('id', ignore_index=True)
+    print(f"Profiles snapshot updated with {len(changed_ids)} new or changed rows ({len(profiles)} total).")
+    _store(name, profiles, dict(meta, version=_profiles_version(profiles), rows=len(profiles)))
+
+def refresh_profiles(environment='prod', max_age=MAX_AGE, full_refresh=False):
+    """
+    Bring the local profiles snapshot up to date and return its version, without loading it.
+
+    The snapshot holds PROFILE_COLUMNS and is refreshed incrementally when it is older than max_age:
+    the database's per-row content hashes are compared with the stored ones, and only new or changed
+    rows are fetched, and downloaded in full the first time or when full_refresh is set.
+
+    :param environment: Target database environment ('prod' or 'stg').
+    :param max_age: timedelta after which the snapshot is checked against the database.
+    """
+    name = f"profiles_{environment}"
+    meta = _read_meta(name)
+
+    if meta is None or full_refresh or not os.path.exists(_snapshot_path(name)):
+        _full_refresh_profiles(name, connections.get_db_engine(environment))
+    elif datetime.now() - datetime.fromisoformat(meta['refreshed_at']) > max_age:
+        _incremental_refresh_profiles(name, connections.get_db_engine(environment), meta)
+
+    return snapshot_version(name)
+
+def load_profiles(environment='prod', max_age=MAX_AGE, full_refresh=False):
+    """
+    PROFILE_COLUMNS of the profiles table from the local snapshot, refreshed first as in refresh_profiles.
+    Rows are ordered by id. Returns a copy the caller may modify.
+    """
+    refresh_profiles(environment, max_age=max_age, full_refresh=full_refresh)
+    return _load(f"profiles_{environment}").drop(columns='row_hash')
+
+def refresh_pharos(pharos_file=PHAROS_FILE):
+    """Rebuild the Pharos snapshot if pharos_file changed since it was taken, and return its version."""
+    stat = os.stat(pharos_file)
+    source = f"{os.path.abspath(pharos_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+    meta = _read_meta('pharos')
+
+    if meta is None or meta.get('source') != source or not os.path.exists(_snapshot_path('pharos')):
+        print(f"Building Pharos snapshot from {pharos_file}...")
+        pharos = pd.read_excel(pharos_file)
+        _store('pharos', pharos, {
+            'version': hashlib.sha1(source.encode()).hexdigest(),
+            'source': source,
+            'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': len(pharos)
+        })
+
+    return snapshot_version('pharos')
+
+def load_pharos(pharos_file=PHAROS_FILE):
+    """
+    Pharos data from the local snapshot, re-read from pharos_file only when that file changes.
+    Returns a copy the caller may modify.
+    """
+    refresh_pharos(pharos_file)
+    return _load('pharos').copy()
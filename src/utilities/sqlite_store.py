@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+
+# Values bound per IN (...) query, well below SQLite's limit on host parameters.
+IN_BATCH_SIZE = 500
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dump_record(record):
+    """JSON text of a match record; numpy scalars (e.g. distances) are stored as plain numbers."""
+    return json.dumps(record, default=_to_json)
+
+def select_in(connection, query, values, params=()):
+    """
+    Rows of a query with an IN list, run in batches of IN_BATCH_SIZE values.
+
+    :param query: SQL with one {placeholders} field where the IN list goes, e.g. "... WHERE x IN ({placeholders})"
+    :param params: parameters bound before the IN list values
+    """
+    values = list(values)
+    for start in range(0, len(values), IN_BATCH_SIZE):
+        batch = values[start:start + IN_BATCH_SIZE]
+        yield from connection.execute(query.format(placeholders=','.join('?' * len(batch))), [*params, *batch])
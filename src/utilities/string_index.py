@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz.distance import Levenshtein
+from rapidfuzz.process import cdist
+
+INDEX_DIR = os.path.join(os.path.dirname(__file__), '../../data/cache/string_index')
+PAD = '\x00'
+
+# Grams found in more than this fraction of the strings (at least MIN_SKIPPED_POSTINGS of them)
+# are too common to narrow a query down and are not used as candidate sources.
+MAX_POSTINGS_FRACTION = 0.05
+MIN_SKIPPED_POSTINGS = 256
+
+# Part of every index fingerprint; bump it when the pickled NGramIndex layout changes so old
+# index files are rebuilt.
+INDEX_FORMAT = 2
+
+def strings_fingerprint(strings, q=3):
+    """
+    Fingerprint of the indexed strings, used to decide when an on-disk index is stale.
+    """
+    digest = hashlib.sha1(f"format={INDEX_FORMAT}|q={q}".encode())
+    for string in strings:
+        digest.update(string.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class NGramIndex:
+    """
+    Inverted q-gram index supporting bounded Levenshtein distance queries.
+
+    Candidates are found with the q-gram count filter (strings within edit distance k share at
+    least max(len) + q - 1 - k * q padded q-grams) and a length filter, then verified exactly.
+    Positions refer to the order of the strings the index was built from.
+    """
+
+    def __init__(self, strings, q=3):
+        self.q = q
+        self.strings = [str(x) if x is not None else "" for x in strings]
+        self.fingerprint = strings_fingerprint(self.strings, q)
+        self.lengths = np.array([len(string) for string in self.strings], dtype=np.int32)
+        self.length_order = np.argsort(self.lengths, kind='stable')
+        self.sorted_lengths = self.lengths[self.length_order]
+
+        self.first_positions = {}
+        for position, string in enumerate(self.strings):
+            self.first_positions.setdefault(string, position)
+
+        postings = defaultdict(list)
+        for position, string in enumerate(self.strings):
+            for gram in self.grams(string):
+                postings[gram].append(position)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    def grams(self, string):
+        """Padded q-grams of a string, numbered by occurrence so repeats count as a multiset."""
+        padded = PAD * (self.q - 1) + string + PAD * (self.q - 1)
+        seen = defaultdict(int)
+        grams = []
+        for i in range(len(string) + self.q - 1):
+            gram = padded[i:i + self.q]
+            seen[gram] += 1
+            grams.append((gram, seen[gram]))
+        return grams
+
+    def _length_window(self, length, max_distance):
+        lo = np.searchsorted(self.sorted_lengths, length - max_distance, side='left')
+        hi = np.searchsorted(self.sorted_lengths, length + max_distance, side='right')
+        return self.length_order[lo:hi]
+
+    def candidates(self, value, max_distance):
+        """
+        Positions that may lie within max_distance of value.
+
+        Grams whose postings cover more than MAX_POSTINGS_FRACTION of the strings say little and are
+        skipped; each skipped gram lowers the required shared-gram count by one, so no match is lost.
+        """
+        length = len(value)
+        threshold_slack = length + self.q - 1 - max_distance * self.q
+        if threshold_slack <= 0:
+            return self._length_window(length, max_distance)
+
+        max_postings = max(int(len(self.strings) * MAX_POSTINGS_FRACTION), MIN_SKIPPED_POSTINGS)
+        lists, skipped = [], 0
+        for gram in self.grams(value):
+            postings = self.postings.get(gram)
+            if postings is None:
+                continue
+            if len(postings) > max_postings:
+                skipped += 1
+            else:
+                lists.append(postings)
+        if threshold_slack - skipped <= 0:
+            return self._length_window(length, max_distance)
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        positions, counts = np.unique(np.concatenate(lists), return_counts=True)
+        thresholds = np.maximum(self.lengths[positions], length) + self.q - 1 - max_distance * self.q - skipped
+        keep = (counts >= thresholds) & (np.abs(self.lengths[positions] - length) <= max_distance)
+        return positions[keep]
+
+    def query(self, value, max_distance=2, max_candidates=None):
+        """
+        All indexed strings within max_distance edits of value.
+        Returns a list of (position, distance) sorted by distance, then position, or None when
+        there are more than max_candidates candidates to verify (a full scan is then cheaper).
+        """
+        value = str(value) if value is not None else ""
+        positions = np.sort(self.candidates(value, max_distance))
+        if max_candidates is not None and len(positions) > max_candidates:
+            return None
+        if len(positions) == 0:
+            return []
+        distances = cdist([value], [self.strings[p] for p in positions], scorer=Levenshtein.distance,
+                          score_cutoff=max_distance, dtype=np.int32, workers=1)[0]
+        within = distances <= max_distance
+        order = np.lexsort((positions[within], distances[within]))
+        return [(int(positions[within][i]), int(distances[within][i])) for i in order]
+
+    def nearest(self, value, max_distance=2, max_candidates=None):
+        """
+        First nearest (position, distance) within max_distance, or None when nothing is that close
+        or the query has more than max_candidates candidates.
+        """
+        hits = self.query(value, max_distance, max_candidates=max_candidates)
+        return hits[0] if hits else None
+
+    def exact(self, value):
+        """Position of the first indexed string equal to value, or None."""
+        return self.first_positions.get(str(value) if value is not None else "")
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+def load_or_build_index(name, strings, q=3, index_dir=INDEX_DIR):
+    """
+    Load the named index from disk, rebuilding it only when the indexed strings have changed.
+
+    :param name: file name of the index within index_dir
+    :param strings: reference strings to index
+    :return: NGramIndex
+    """
+    strings = [str(x) if x is not None else "" for x in strings]
+    path = os.path.join(index_dir, f"{name}.pkl")
+    fingerprint = strings_fingerprint(strings, q)
+
+    if os.path.exists(path):
+        try:
+            index = NGramIndex.load(path)
+            if index.fingerprint == fingerprint:
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+    print(f"Building string index '{name}' over {len(strings)} entries...")
+    index = NGramIndex(strings, q=q)
+    index.save(path)
+    return index
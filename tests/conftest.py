@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tools import their shared code as top-level packages from src/ (e.g. `from utilities import ...`).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
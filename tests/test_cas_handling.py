@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utilities import cas_handling
+
+def test_analyze_cas_series_final_cas():
+    cas = pd.Series([' 64-17-5 ', '0050-00-0', '7732-18-6', '', None], dtype=object)
+    analysis = cas_handling.analyze_cas_series(cas)
+
+    assert analysis['Final CAS'].tolist() == ['64-17-5', '50-00-0', 'invalid_cas', 'no_cas', 'no_cas']
+    assert analysis['Valid Original'].tolist() == [True, False, False, False, False]
+    assert analysis['Final Valid'].tolist() == [True, True, False, False, False]
+
+def test_analyze_cas_series_multi_chunk_arrow_strings():
+    chunks = pa.chunked_array([['50-00-0', '7732-18-5'], ['64-17-5 ', None, 'bad']])
+    cas = pd.Series(pd.arrays.ArrowStringArray(chunks), index=[5, 4, 3, 2, 1])
+    analysis = cas_handling.analyze_cas_series(cas)
+
+    assert analysis.index.tolist() == [5, 4, 3, 2, 1]
+    assert analysis['Final CAS'].tolist() == ['50-00-0', '7732-18-5', '64-17-5', 'no_cas', 'invalid_cas']
+
+def test_cas_checksum_valid_sliced_and_malformed_values():
+    digits = pa.array(['x', '50000', '12345678901', '64175', '7732186', None])
+
+    assert cas_handling.cas_checksum_valid(digits).tolist() == [False, True, False, True, False, False]
+    assert cas_handling.cas_checksum_valid(digits.slice(3, 2)).tolist() == [True, False]
+    assert cas_handling.cas_checksum_valid(digits.cast(pa.large_string()).slice(1, 3)).tolist() == [True, False, True]
+
+def test_analyze_cas_series_empty():
+    analysis = cas_handling.analyze_cas_series(pd.Series([], dtype=object))
+
+    assert analysis.empty
+    assert analysis.columns.tolist() == ['Valid Original', 'Corrected CAS', 'Valid Corrected', 'Final Valid', 'Final CAS']
+
+def test_cas_key_series_edge_cases():
+    cas = pd.Series([' 7732-18-5 ', '7732185', '07732-18-5', '7732-18-6', '', None, np.nan, 64175,
+                     '1234567-89-5', '12345678-90-1'], index=range(10, 0, -1))
+    keys = cas_handling.cas_key_series(cas)
+
+    assert keys.index.tolist() == list(range(10, 0, -1))
+    assert keys.tolist() == [7732185, 7732185, pd.NA, pd.NA, pd.NA, pd.NA, pd.NA, 64175, 1234567895, pd.NA]
+    assert cas_handling.int_to_cas(keys.dropna()).tolist() == ['7732-18-5', '7732-18-5', '64-17-5', '1234567-89-5']
+
+def test_cas_isin_falls_back_to_strings_for_invalid_values():
+    key_set = cas_handling.cas_key_set(['7732185', 'NOCAS', None])
+    cas = pd.Series(['7732-18-5', ' NOCAS ', '64-17-5', None])
+
+    assert cas_handling.cas_isin(cas, key_set).tolist() == [True, True, False, False]
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rapidfuzz.distance import Levenshtein
+
+from cas_mapping.scripts import cas_mapping
+from utilities import string_index
+
+def baseline_find_best_match(value, profiles_db, mapping):
+    # The per-ingredient scan find_best_matches replaced (Series.apply + argmin per source), kept as
+    # the reference behaviour.
+    value_str = str(value) if value is not None else ""
+    best_match = cas_mapping.empty_match()
+    sources = [
+        (profiles_db["name_lower"], profiles_db, "profiles", "name"),
+        (profiles_db["inci_lower"], profiles_db, "profiles", "inci"),
+        (mapping["name_lower"], mapping, "mapping", "name")
+    ]
+    for source_col, source_df, map_source, map_type in sources:
+        distances = source_col.apply(lambda x: Levenshtein.distance(value_str, str(x) if x is not None else ""))
+        min_index = distances.argmin()
+        min_distance = distances[min_index]
+
+        priority_score = 0
+        if source_df is profiles_db:
+            matched_row = source_df.iloc[min_index]
+            if matched_row['status'] != 'screening_only':
+                priority_score += 10
+            if pd.notna(matched_row['cas_rn']):
+                priority_score += 5
+
+        if (min_distance < best_match['distance_lev'] or
+                (min_distance == best_match['distance_lev'] and priority_score > best_match['priority_score'])):
+            best_match['distance_lev'] = min_distance
+            best_match['priority_score'] = priority_score
+            best_match['map_source'] = map_source
+            best_match['map_type'] = map_type
+            best_match['matched_on'] = source_col.iloc[min_index]
+            matched_row = source_df.iloc[min_index]
+            if source_df is profiles_db:
+                best_match.update(cas_mapping.profile_match_fields(matched_row))
+            else:
+                best_match.update(cas_mapping.mapping_match_fields(matched_row))
+            if min_distance == 0:
+                break
+    return best_match
+
+def random_strings(rng, n, alphabet='abcd', max_length=7):
+    return [''.join(rng.choice(list(alphabet), size=rng.integers(0, max_length + 1))) for _ in range(n)]
+
+def reference_data(rng, n_profiles=400, n_mappings=60):
+    names = random_strings(rng, n_profiles)
+    incis = random_strings(rng, n_profiles)
+    names[5], incis[7] = None, np.nan
+    profiles_db = pd.DataFrame({
+        'name': names,
+        'inci': incis,
+        'cas_rn': [None if i % 3 == 0 else f"{i}-00-0" for i in range(n_profiles)],
+        'status': rng.choice(['screening_only', 'verified', 'draft'], size=n_profiles),
+        'manual_hazard_band_score': 'B',
+        'manual_rollup_score': None,
+        'scil_status': None,
+        'tco_status': None,
+        'list_based_hazard_score': None,
+        'list_based_c2c_score': None,
+        'additional_casrns_list': [[] if i % 2 else ['1-11-1'] for i in range(n_profiles)]
+    })
+    profiles_db['name_lower'] = profiles_db['name'].str.lower()
+    profiles_db['inci_lower'] = profiles_db['inci'].str.lower()
+    mapping = pd.DataFrame({'name': random_strings(rng, n_mappings), 'casrn': 'NA', 'type': 'blend'})
+    mapping['name_lower'] = mapping['name'].str.lower()
+    return profiles_db, mapping
+
+def comparable(match):
+    return {key: None if not isinstance(value, (list, dict)) and pd.isna(value) else value
+            for key, value in match.items()}
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_find_best_matches_equals_baseline_scan(use_index, monkeypatch):
+    rng = np.random.default_rng(0)
+    profiles_db, mapping = reference_data(rng)
+    queries = random_strings(rng, 300, alphabet='abcde', max_length=9) + ['', None, 'nan']
+    queries += list(profiles_db['name_lower'].dropna()[:20])
+
+    indexes = None
+    if use_index:
+        # Let the index answer most queries itself, and skip common grams, so both paths are exercised.
+        monkeypatch.setattr(cas_mapping, 'INDEX_MAX_CANDIDATES_FRACTION', 1.0)
+        monkeypatch.setattr(string_index, 'MIN_SKIPPED_POSTINGS', 8)
+        monkeypatch.setattr(string_index, 'MAX_POSTINGS_FRACTION', 0.05)
+        indexes = {
+            "profiles_name": string_index.NGramIndex(profiles_db['name_lower']),
+            "profiles_inci": string_index.NGramIndex(profiles_db['inci_lower']),
+            "cas_mapping": string_index.NGramIndex(mapping['name_lower'])
+        }
+
+    matches = cas_mapping.find_best_matches(queries, profiles_db, mapping, indexes=indexes, workers=1)
+
+    for query in queries:
+        assert comparable(matches[query]) == comparable(baseline_find_best_match(query, profiles_db, mapping)), query
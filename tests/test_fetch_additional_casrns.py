@@ -0,0 +1,92 @@
+import importlib
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+fetch_additional_casrns = importlib.import_module('ingredient_intelligence_report.scripts.02_fetch_additional_casrns')
+
+def baseline_select_relevant_profile(cas, all_profiles):
+    # The per-CAS scan the profile index replaced, kept as the reference behaviour.
+    profiles = all_profiles[
+        all_profiles['additional_casrn'].apply(lambda x: json.loads(x).get('additional_casrn')) == cas]
+    if profiles.empty:
+        return None, None
+    for tier in (profiles[profiles['status'] != 'screening_only'],
+                 profiles.dropna(subset=['list_based_hazard_score']),
+                 profiles[profiles['manual_hazard_band_score'] != '?'],
+                 profiles):
+        if not tier.empty:
+            selected = tier.iloc[0]
+            return selected['cas_rn'], selected
+
+def all_profiles():
+    rows = [
+        # 111-11-1: a verified profile wins over an earlier screening-only one.
+        ('1-00-1', 'screening_only', 'A', 'B', '111-11-1'),
+        ('2-00-2', 'verified', None, '?', '111-11-1'),
+        # 222-22-2: only screening-only profiles; the one with a list-based score wins.
+        ('3-00-3', 'screening_only', None, 'B', '222-22-2'),
+        ('4-00-4', 'screening_only', 'C', '?', '222-22-2'),
+        # 333-33-3: no list-based scores; a manual band other than '?' (missing counts) wins.
+        ('5-00-5', 'screening_only', None, '?', '333-33-3'),
+        ('6-00-6', 'screening_only', None, None, '333-33-3'),
+        # 444-44-4: nothing qualifies; the first profile is kept.
+        ('7-00-7', 'screening_only', None, '?', '444-44-4'),
+        ('8-00-8', 'screening_only', None, '?', '444-44-4'),
+        # 555-55-5: several in the same tier; query order decides.
+        ('9-00-9', 'draft', None, '?', '555-55-5'),
+        ('10-00-0', 'verified', 'A', 'A', '555-55-5'),
+        ('11-00-1', 'verified', None, None, None),
+    ]
+    return pd.DataFrame({
+        'cas_rn': [row[0] for row in rows],
+        'status': [row[1] for row in rows],
+        'list_based_hazard_score': [row[2] for row in rows],
+        'manual_hazard_band_score': [row[3] for row in rows],
+        'additional_casrn': [json.dumps({'additional_casrn': row[4]}) for row in rows],
+    })
+
+def test_profile_priority_tiers():
+    profiles = all_profiles()
+    assert fetch_additional_casrns.profile_priority(profiles).tolist() == [1, 0, 2, 1, 3, 2, 3, 3, 0, 0, 0]
+
+def test_profile_index_matches_baseline_selection():
+    profiles = all_profiles()
+    index = fetch_additional_casrns.build_profile_index(profiles)
+
+    for cas in ['111-11-1', '222-22-2', '333-33-3', '444-44-4', '555-55-5', '999-99-9', None, np.nan]:
+        expected_cas, expected_profile = baseline_select_relevant_profile(cas, profiles)
+        selected_cas, selected_profile = fetch_additional_casrns.select_relevant_profile(cas, index)
+        assert selected_cas == expected_cas, cas
+        if expected_profile is None:
+            assert selected_profile is None
+        else:
+            assert selected_profile.to_dict() == expected_profile.to_dict()
+
+def test_interactive_review_asks_every_row_and_resumes_after_abort(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_additional_casrns, 'review_answers_dir', str(tmp_path))
+    monkeypatch.setattr(fetch_additional_casrns, 'get_original_profiles', lambda cas_numbers: {})
+    # The same original CAS twice: each row gets its own answer, as without saved answers.
+    df = pd.DataFrame({'Final CAS': ['111-11-1', '222-22-2', '111-11-1', '50-00-0']})
+    prompts = []
+    def answer_with(answers):
+        answers = iter(answers)
+        def fake_input(prompt):
+            prompts.append(prompt)
+            return next(answers)
+        monkeypatch.setattr('builtins.input', fake_input)
+
+    answer_with(['3', 'y', 'ABORT PROCESS'])
+    with pytest.raises(fetch_additional_casrns.ReviewAborted) as aborted:
+        fetch_additional_casrns.process_cas_frame(df, all_profiles())
+    assert aborted.value.df['replaced?'].tolist() == [True, False, False, False]
+
+    prompts.clear()
+    answer_with(['3', 'n', 'n'])
+    result = fetch_additional_casrns.process_cas_frame(df, all_profiles())
+
+    assert len(prompts) == 3
+    assert result['Final CAS'].tolist() == ['2-00-2', '222-22-2', '111-11-1', '50-00-0']
+    assert result['suggested_Final CAS'].tolist() == ['2-00-2', '4-00-4', '2-00-2', None]
@@ -0,0 +1,64 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from cas_mapping.scripts import cas_mapping
+
+BASELINE_PHRASES = [
+    "peut contenir", "fair trade ingredient", "parfum/fragrance",
+    "(parfum)fragrance", "fragrance (parfum)", "(parfum) fragrance",
+    "certified organic ingredient", "certified organic ingredients",
+    "certified organicingredients", "natural ingredients",
+    "may vary in color and consistency", "usda", "love & pride.",
+    "love & pride", "()"
+]
+
+def baseline_clean_ingredients(ingredients):
+    # The former per-row cleaning, with one chained replace per phrase.
+    ingredients = str(ingredients)
+    ingredients = ingredients.encode("utf-8", "ignore").decode("utf-8", "ignore")
+    ingredients = ingredients.replace('*', '').replace(':', '').replace('±', '')
+    for phrase in BASELINE_PHRASES:
+        ingredients = ingredients.replace(phrase, '')
+    ingredients = ingredients.lower()
+    ingredients = re.sub(r'[^a-zA-Z0-9\s(),-]', '', ingredients)
+    return ingredients.strip()
+
+def baseline_explode(df, ingredients_column):
+    df = df.copy()
+    df['ingredients_lower'] = df[ingredients_column].apply(baseline_clean_ingredients).str.split(r',\s+')
+    return df.explode('ingredients_lower')
+
+def random_ingredient_lists(rng, n):
+    tokens = BASELINE_PHRASES + ['Aqua', 'GLYCERIN*', 'CI 77491:', '±Mica', 'Café', 'Tocopherol (Vit. E)',
+                                 '(parfum)', 'Parfum', 'usda organic aloe', 'water', '', ' ', 'Linalool ']
+    separators = [', ', ',  ', ', ', ', ', ' , ', ',', '\n, ']
+    lists = []
+    for _ in range(n):
+        parts = rng.choice(tokens, size=rng.integers(1, 8))
+        text = parts[0]
+        for part in parts[1:]:
+            text += rng.choice(separators) + part
+        lists.append(text)
+    return lists
+
+def test_explode_ingredients_equals_baseline_clean_and_explode():
+    rng = np.random.default_rng(2)
+    raw = random_ingredient_lists(rng, 400)
+    df = pd.DataFrame({'product': [f"p{i % 150}" for i in range(len(raw) + 2)], 'ingredients': raw + [None, np.nan]},
+                      index=np.arange(len(raw) + 2)[::-1])
+
+    exploded = cas_mapping.explode_ingredients(df, 'ingredients')
+    expected = baseline_explode(df, 'ingredients')
+
+    assert exploded['ingredients_lower'].dtype == cas_mapping.INGREDIENT_DTYPE
+    pd.testing.assert_frame_equal(exploded.astype({'ingredients_lower': object}), expected)
+
+def test_explode_ingredients_overlapping_phrases():
+    # The documented difference: the phrases are removed in one left-to-right pass, so where two
+    # phrases overlap the one starting first wins instead of the one listed first.
+    df = pd.DataFrame({'ingredients': ['xfragrance (parfum)fragrance, aqua']})
+
+    assert cas_mapping.explode_ingredients(df, 'ingredients')['ingredients_lower'].tolist() == ['xfragrance', 'aqua']
+    assert baseline_explode(df, 'ingredients')['ingredients_lower'].tolist() == ['xfragrance ', 'aqua']
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from ingredient_intelligence_report import main
+
+def test_stage_cache_hit_and_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'cache_dir', str(tmp_path))
+    manifest = {'input': 'a', 'code': 'b', 'reference_data': {'pharos': 'v1'}}
+    result = pd.DataFrame({'Final CAS': ['50-00-0', 'no_cas'], 'count': [1.0, None]})
+
+    assert main.cached_result('04_fetch_data_pharos', manifest) is None
+    stored = main.store_result('04_fetch_data_pharos', manifest, result)
+
+    pd.testing.assert_frame_equal(main.cached_result('04_fetch_data_pharos', manifest), stored)
+    assert main.cached_result('04_fetch_data_pharos', dict(manifest, reference_data={'pharos': 'v2'})) is None
+    assert main.cached_result('04_fetch_data_pharos', dict(manifest, live_data='c')) is None
+
+def test_code_version_covers_sql_and_utilities():
+    assert main.imported_utilities(f"{main.script_dir}/scripts/04_fetch_data_pharos.py") == [
+        'cas_handling', 'columnar', 'connections', 'data_manipulation', 'snapshots']
+    assert main.code_version('04_fetch_data_pharos') != main.code_version('05_gathered_data_merge')
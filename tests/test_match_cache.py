@@ -0,0 +1,67 @@
+import sqlite3
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from utilities import decision_store, match_cache
+
+def test_match_cache_hit_and_miss(tmp_path):
+    cache = match_cache.MatchCache('v1', path=str(tmp_path / 'matches.sqlite'))
+    cache.put_many({'water': {'distance_lev': np.int64(0), 'map_casrn': '7732-18-5'}})
+
+    assert cache.get_many(['water', 'aqua']) == {'water': {'distance_lev': 0, 'map_casrn': '7732-18-5'}}
+    cache.close()
+
+def test_match_cache_keeps_other_reference_versions(tmp_path):
+    path = str(tmp_path / 'matches.sqlite')
+    first = match_cache.MatchCache('v1', path=path)
+    first.put_many({'water': {'map_casrn': '7732-18-5'}})
+    second = match_cache.MatchCache('v2', path=path)
+    second.put_many({'water': {'map_casrn': '64-17-5'}})
+
+    assert first.get_many(['water']) == {'water': {'map_casrn': '7732-18-5'}}
+    assert second.get_many(['water']) == {'water': {'map_casrn': '64-17-5'}}
+    first.close()
+    second.close()
+
+def test_match_cache_evicts_by_age(tmp_path):
+    path = str(tmp_path / 'matches.sqlite')
+    cache = match_cache.MatchCache('v1', path=path)
+    cache.put_many({'water': {}, 'aqua': {}})
+    with cache.connection:
+        cache.connection.execute("UPDATE matches SET stored_at = ? WHERE ingredient = 'aqua'",
+                                 (time.time() - timedelta(days=60).total_seconds(),))
+    cache.close()
+
+    reopened = match_cache.MatchCache('v1', path=path, max_age=timedelta(days=30))
+    assert set(reopened.get_many(['water', 'aqua'])) == {'water'}
+    reopened.close()
+
+def test_match_cache_upgrades_old_table(tmp_path):
+    path = str(tmp_path / 'matches.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE matches (reference_version TEXT NOT NULL, ingredient TEXT NOT NULL, "
+                       "record TEXT NOT NULL, PRIMARY KEY (reference_version, ingredient))")
+    connection.execute("INSERT INTO matches VALUES ('v1', 'water', '{}')")
+    connection.commit()
+    connection.close()
+
+    cache = match_cache.MatchCache('v1', path=path)
+    assert cache.get_many(['water']) == {}
+    cache.put_many({'water': {}})
+    assert cache.get_many(['water']) == {'water': {}}
+    cache.close()
+
+def test_decision_store_latest_across_batches(tmp_path):
+    store = decision_store.DecisionStore(path=str(tmp_path / 'decisions.sqlite'))
+    ingredients = [f"ingredient {i}" for i in range(1200)]
+    for ingredient in ingredients:
+        store.record(ingredient, {'distance_lev': '1-UN'})
+    store.record('ingredient 7', {'distance_lev': '0-UY'})
+
+    latest = store.latest(ingredients + ['unknown'])
+    assert len(latest) == 1200
+    assert latest['ingredient 7'] == ('y', {'distance_lev': '0-UY'})
+    assert latest['ingredient 1100'][0] == 'n'
+    store.close()
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from utilities import connections
+
+QUERY = "SELECT * FROM profiles"
+
+def fake_database(monkeypatch, frames):
+    calls = []
+    def run_query_stream(engine, query, chunksize=None, params=None):
+        calls.append(query)
+        yield from (frame.copy() for frame in frames)
+    monkeypatch.setattr(connections, 'get_db_engine', lambda environment='prod': None)
+    monkeypatch.setattr(connections, 'run_query_stream', run_query_stream)
+    monkeypatch.setattr(connections, 'run_query', lambda engine, query, params=None: next(run_query_stream(engine, query)))
+    return calls
+
+def test_cached_query_miss_and_hit_return_the_same_frame(tmp_path, monkeypatch):
+    result = pd.DataFrame({'id': [1, 2], 'document': [{'a': [1]}, 'text'], 'cas_rn': ['50-00-0', np.nan]})
+    calls = fake_database(monkeypatch, [result])
+
+    miss = connections.run_cached_query('prod', QUERY, cache_dir=str(tmp_path))
+    hit = connections.run_cached_query('prod', QUERY, cache_dir=str(tmp_path))
+
+    assert len(calls) == 1
+    assert miss.to_dict('list') == hit.to_dict('list')
+    assert miss['document'].tolist() == [{'a': [1]}, 'text']
+
+def test_cached_query_stream_hit_and_refresh(tmp_path, monkeypatch):
+    chunks = [pd.DataFrame({'id': [1, 2]}), pd.DataFrame({'id': [3]})]
+    calls = fake_database(monkeypatch, chunks)
+
+    fetched = list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path)))
+    cached = list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path)))
+    list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path), refresh=True))
+
+    assert len(calls) == 2
+    assert [chunk['id'].tolist() for chunk in cached] == [[1, 2], [3]]
+    for fetched_chunk, cached_chunk in zip(fetched, cached):
+        tm.assert_frame_equal(fetched_chunk, cached_chunk)
+
+def test_cached_query_stream_stopped_early_leaves_no_entry(tmp_path, monkeypatch):
+    calls = fake_database(monkeypatch, [pd.DataFrame({'id': [1]}), pd.DataFrame({'id': [2]})])
+
+    stream = connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path))
+    next(stream)
+    stream.close()
+    assert os.listdir(tmp_path) == []
+    list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path)))
+
+    assert len(calls) == 2
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_cached_query_reads_a_whole_stream_entry(tmp_path, monkeypatch):
+    calls = fake_database(monkeypatch, [pd.DataFrame({'id': [1, 2]}), pd.DataFrame({'id': [3]})])
+
+    list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path)))
+    result = connections.run_cached_query('prod', QUERY, cache_dir=str(tmp_path))
+
+    assert len(calls) == 1
+    assert result['id'].tolist() == [1, 2, 3]
+    assert result.index.tolist() == [0, 1, 2]
+
+def test_cached_query_reads_an_empty_stream_entry(tmp_path, monkeypatch):
+    calls = fake_database(monkeypatch, [])
+
+    assert list(connections.run_cached_query_stream('prod', QUERY, cache_dir=str(tmp_path))) == []
+    result = connections.run_cached_query('prod', QUERY, cache_dir=str(tmp_path))
+
+    assert len(calls) == 1
+    assert result.empty
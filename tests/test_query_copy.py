@@ -0,0 +1,88 @@
+import warnings
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pandas as pd
+
+from utilities import connections
+
+Column = namedtuple('Column', ['name', 'type_code'])
+
+# One result as psycopg2 returns it to read_sql and as Postgres writes it with COPY ... TO STDOUT.
+COLUMNS = [
+    Column('id', 23), Column('big', 20), Column('score', 1700), Column('rank', 1700), Column('ratio', 701), Column('active', 16),
+    Column('flag', 16), Column('additional_casrns', 3802), Column('created', 1082), Column('updated', 1114),
+    Column('updated_tz', 1184), Column('name', 25), Column('empty', 23)
+]
+PLUS_TWO = timezone(timedelta(hours=2))
+ROWS = [
+    (1, 10, Decimal('5'), Decimal('1'), 0.5, True, True, [{'additional_casrn': '50-00-0'}], date(2024, 3, 1),
+     datetime(2024, 3, 1, 12, 30), datetime(2024, 3, 1, 12, 30, tzinfo=PLUS_TWO), 'water', None),
+    (2, None, Decimal('2.50'), Decimal('2'), float('nan'), False, None, None, None,
+     datetime(2024, 3, 2, 8, 0, 0, 500000), datetime(2024, 3, 2, 8, 0, tzinfo=PLUS_TWO), '', None),
+    (3, 30, None, Decimal('3'), float('inf'), True, False, {'a': None}, date(1999, 12, 31),
+     datetime(2024, 3, 3), datetime(2024, 3, 3, tzinfo=PLUS_TWO), '\\N', None),
+]
+COPY_CSV = (
+    'id,big,score,rank,ratio,active,flag,additional_casrns,created,updated,updated_tz,name,empty\n'
+    '1,10,5,1,0.5,t,t,"[{""additional_casrn"": ""50-00-0""}]",2024-03-01,2024-03-01 12:30:00,'
+    '2024-03-01 12:30:00+02,water,\\N\n'
+    '2,\\N,2.50,2,NaN,f,\\N,\\N,\\N,2024-03-02 08:00:00.5,2024-03-02 08:00:00+02,"",\\N\n'
+    '3,30,\\N,3,Infinity,t,f,"{""a"": null}",1999-12-31,2024-03-03 00:00:00,2024-03-03 00:00:00+02,"\\N",\\N\n'
+)
+
+class FakeCursor:
+    description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.description = COLUMNS
+
+    def fetchall(self):
+        return list(ROWS)
+
+    def copy_expert(self, sql, file):
+        assert sql.startswith('COPY (SELECT')
+        file.write(COPY_CSV.encode())
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.connection = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+class FakeEngine:
+    def connect(self):
+        return FakeConnection()
+
+def test_copy_matches_read_sql():
+    query = "SELECT * FROM profiles"
+    with warnings.catch_warnings():
+        # read_sql warns about DBAPI connections other than sqlite3, which the fake is.
+        warnings.simplefilter('ignore', UserWarning)
+        expected = pd.read_sql(query, FakeConnection())
+
+    result = connections.run_query(FakeEngine(), query, method='copy')
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['created'].tolist() == [date(2024, 3, 1), None, date(1999, 12, 31)]
+    assert result['name'].tolist() == ['water', '', '\\N']
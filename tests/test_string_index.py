@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from rapidfuzz.distance import Levenshtein
+
+from utilities import string_index
+
+def random_strings(rng, n, alphabet='abcd', max_length=8):
+    return [''.join(rng.choice(list(alphabet), size=rng.integers(0, max_length + 1))) for _ in range(n)]
+
+@pytest.mark.parametrize('min_skipped_postings', [string_index.MIN_SKIPPED_POSTINGS, 4])
+def test_query_finds_every_string_within_distance(min_skipped_postings, monkeypatch):
+    # With a low MIN_SKIPPED_POSTINGS most common grams are skipped, which must not lose any match.
+    monkeypatch.setattr(string_index, 'MIN_SKIPPED_POSTINGS', min_skipped_postings)
+    rng = np.random.default_rng(1)
+    strings = random_strings(rng, 500) + ['', 'abcabcabcabc', 'aaaa', 'aaaa']
+    index = string_index.NGramIndex(strings)
+
+    for value in random_strings(rng, 150, alphabet='abcde', max_length=10) + ['', 'aaaa']:
+        for max_distance in range(4):
+            expected = sorted((Levenshtein.distance(value, string), position)
+                              for position, string in enumerate(strings)
+                              if Levenshtein.distance(value, string) <= max_distance)
+            hits = index.query(value, max_distance)
+            assert [(distance, position) for position, distance in hits] == expected, (value, max_distance)
+
+def test_query_gives_up_above_max_candidates():
+    index = string_index.NGramIndex(['abc', 'abd', 'abe', 'xyz'])
+
+    assert index.query('abf', 1, max_candidates=2) is None
+    assert index.nearest('abf', 1, max_candidates=3) == (0, 1)
+    assert index.exact('abd') == 1 and index.exact('abf') is None